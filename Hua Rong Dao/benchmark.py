@@ -0,0 +1,240 @@
+"""
+Benchmark hrd_starter over the puzzles bundled with it.
+
+Every algorithm and engine is run several times on every puzzle, each run in a
+fresh process so that its peak memory is not inflated by earlier runs. The number
+of moves written is checked against the reference solution in <puzzle>_sol.txt,
+a run that takes longer than --timeout counts as a failure instead of holding up
+the rest, and the timings are saved as JSON so that runs made at different commits can be
+compared with --compare.
+
+    python benchmark.py --algos astar dfs --engines board packed --output new.json
+    python benchmark.py --output new.json --compare old.json
+    python benchmark.py --solver-options "--heuristic pdb" --timeout 60
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import platform
+import resource
+import shlex
+import subprocess
+import tempfile
+import time
+
+import hrd_starter
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Algorithms that return a shortest solution, so their length must match the
+# reference exactly. dfs only has to agree on whether there is a solution.
+OPTIMAL_ALGOS = {'astar', 'idastar', 'smastar', 'bidir'}
+
+
+def count_moves(filename):
+    """
+    returns the number of moves in the solution file <filename>, or None if it
+    records that there is no solution
+    """
+    with open(filename) as solution_file:
+        text = solution_file.read()
+    if text.strip() == "No solution":
+        return None
+    return len([block for block in text.split("\n\n") if block.strip()]) - 1
+
+
+def reference_moves(puzzle):
+    """
+    returns the number of moves in the reference solution of <puzzle>, or None if
+    there is no solution
+    """
+    return count_moves(os.path.splitext(puzzle)[0] + "_sol.txt")
+
+
+def run_once(task) -> dict:
+    """
+    Solve one puzzle, where <task> is (puzzle, output file, solver options).
+    Runs in its own process and returns the time, peak memory and search counts.
+    """
+    puzzle, outputfile, options = task
+    args = hrd_starter.build_parser().parse_args(options)
+    stats = hrd_starter.SearchStats()
+    started = time.perf_counter()
+    hrd_starter.solve(puzzle, outputfile, args, stats)
+    seconds = time.perf_counter() - started
+    return {
+        "seconds": seconds,
+        # ru_maxrss is in kilobytes on Linux.
+        "peak_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "expanded": stats.expanded,
+        "generated": stats.generated,
+        # dfs writes every board it visits, so its length is the depth of the goal.
+        "moves": count_moves(outputfile) if args.algo in OPTIMAL_ALGOS else stats.solution_length,
+    }
+
+
+def benchmark(puzzles, algos, engines, repeat, extra, timeout=None) -> list:
+    """
+    returns one result per puzzle, algorithm and engine, each holding the timings
+    of <repeat> runs. A run taking more than <timeout> seconds is stopped, and its
+    result is marked as timed out and incorrect.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as scratch:
+        outputfile = os.path.join(scratch, "solution.txt")
+        for puzzle in puzzles:
+            reference = reference_moves(puzzle)
+            for algo in algos:
+                for engine in engines:
+                    options = ["--algo", algo, "--engine", engine] + extra
+                    runs = []
+                    timed_out = False
+                    for _ in range(repeat):
+                        # Leaving the pool terminates a worker that is still running.
+                        with multiprocessing.Pool(1) as pool:
+                            try:
+                                runs.append(pool.apply_async(run_once, ((puzzle, outputfile, options),))
+                                            .get(timeout))
+                            except multiprocessing.TimeoutError:
+                                timed_out = True
+                                runs = [{"seconds": timeout, "peak_kb": 0, "expanded": None,
+                                         "generated": None, "moves": None}]
+                                break
+                    moves = runs[-1]["moves"]
+                    if timed_out:
+                        correct = False
+                    elif algo in OPTIMAL_ALGOS:
+                        correct = moves == reference
+                    else:
+                        correct = (moves is None) == (reference is None)
+                    seconds = [run["seconds"] for run in runs]
+                    results.append({
+                        "puzzle": os.path.basename(puzzle),
+                        "algo": algo,
+                        "engine": engine,
+                        "options": extra,
+                        "seconds": seconds,
+                        "best_seconds": min(seconds),
+                        "mean_seconds": sum(seconds) / len(seconds),
+                        "peak_kb": max(run["peak_kb"] for run in runs),
+                        "expanded": runs[-1]["expanded"],
+                        "generated": runs[-1]["generated"],
+                        "moves": moves,
+                        "reference_moves": reference,
+                        "timed_out": timed_out,
+                        "correct": correct,
+                    })
+    return results
+
+
+def git_commit():
+    """
+    returns the commit being benchmarked, or None outside a git checkout
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def result_key(result) -> tuple:
+    return result["puzzle"], result["algo"], result["engine"], tuple(result["options"])
+
+
+def print_results(results, baseline=None):
+    """
+    Print a table of <results>, with the best time and peak memory relative to the
+    matching results of <baseline> when given.
+    """
+    previous = {result_key(result): result for result in (baseline or [])}
+    print("{:<10} {:<8} {:<7} {:>9} {:>9} {:>10} {:>6} {:>6}  {}".format(
+        "puzzle", "algo", "engine", "best (s)", "mean (s)", "peak (MB)", "moves", "ref", "ok"))
+    for result in results:
+        line = "{:<10} {:<8} {:<7} {:>9.3f} {:>9.3f} {:>10.1f} {:>6} {:>6}  {}".format(
+            result["puzzle"], result["algo"], result["engine"], result["best_seconds"],
+            result["mean_seconds"], result["peak_kb"] / 1024,
+            "timeout" if result.get("timed_out") else str(result["moves"]),
+            str(result["reference_moves"]), "yes" if result["correct"] else "NO")
+        old = previous.get(result_key(result))
+        if old is not None:
+            line += "  time x{:.2f}  memory x{:.2f}".format(result["best_seconds"] / max(old["best_seconds"], 1e-9),
+                                                         result["peak_kb"] / max(old["peak_kb"], 1))
+        print(line)
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Benchmark hrd_starter over the bundled puzzles.")
+    parser.add_argument(
+        "--puzzles",
+        type=str,
+        default=HERE,
+        help="A directory or glob of puzzle files, each with a reference <puzzle>_sol.txt."
+    )
+    parser.add_argument(
+        "--algos",
+        nargs="+",
+        default=['astar', 'dfs'],
+        help="The algorithms to run."
+    )
+    parser.add_argument(
+        "--engines",
+        nargs="+",
+        default=['board', 'packed'],
+        help="The engines to run each algorithm with."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="The number of runs of each configuration."
+    )
+    parser.add_argument(
+        "--timeout",
+        type=float,
+        default=600,
+        help="The seconds a single run may take before it is stopped and failed."
+    )
+    parser.add_argument(
+        "--solver-options",
+        type=str,
+        default="",
+        help="Extra hrd_starter options for every run, e.g. '--heuristic pdb'."
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        help="Where to save the results as JSON."
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        help="A JSON file saved by an earlier run to compare against."
+    )
+    args = parser.parse_args()
+
+    puzzles = [puzzle for puzzle in hrd_starter.batch_inputs(args.puzzles)
+               if os.path.exists(os.path.splitext(puzzle)[0] + "_sol.txt")]
+    results = benchmark(puzzles, args.algos, args.engines, args.repeat, shlex.split(args.solver_options),
+                        args.timeout)
+
+    baseline = None
+    if args.compare is not None:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+    print_results(results, baseline)
+
+    if args.output is not None:
+        with open(args.output, "w") as output_file:
+            json.dump({
+                "commit": git_commit(),
+                "python": platform.python_version(),
+                "repeat": args.repeat,
+                "results": results,
+            }, output_file, indent=2)
+            output_file.write("\n")
+
+    if not all(result["correct"] for result in results):
+        raise SystemExit(1)
@@ -0,0 +1,54 @@
+"""
+Build Hua Rong Dao distance tables and answer hint requests from them.
+
+The first board of the input file is the current position and the second is the
+goal, as for hrd_starter. The table for the goal is built once, by enumerating
+every board the goal can be reached from, and every later query is a lookup.
+
+    python hint.py --inputfile hard1.txt --build
+    python hint.py --inputfile position.txt
+"""
+import argparse
+import time
+
+import hrd_starter
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Print the moves left and the next move of a shortest solution.")
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        required=True,
+        help="A file holding the current board and the goal board."
+    )
+    parser.add_argument(
+        "--table-dir",
+        type=str,
+        default="tables",
+        help="Where distance tables are stored; missing ones are built."
+    )
+    parser.add_argument(
+        "--build",
+        action="store_true",
+        help="Only build the table for the goal, and report its size."
+    )
+    args = parser.parse_args()
+
+    board, goal_board = hrd_starter.read_from_file(args.inputfile)
+    started = time.perf_counter()
+    table = hrd_starter.DistanceTable(goal_board, args.table_dir)
+    if args.build:
+        print("{}: {} boards, loaded in {:.3f}s".format(table.table.filename, len(table),
+                                                       time.perf_counter() - started))
+    else:
+        distance = table.distance(board)
+        if distance is None:
+            print("No solution")
+        elif distance == 0:
+            print("Solved")
+        else:
+            print("{} moves left. Next:".format(distance))
+            table.hint(board).display()
+    table.close()
@@ -1,526 +1,3653 @@
-import argparse
-import sys
-import pdb
-import heapq
-
-# ====================================================================================
-
-char_single = '2'
-
-
-class Piece:
-    """
-    This represents a piece on the Hua Rong Dao puzzle.
-    """
-
-    def __init__(self, is_2_by_2, is_single, coord_x, coord_y, orientation):
-        """
-        :param is_2_by_2: True if the piece is a 2x2 piece and False otherwise.
-        :type is_2_by_2: bool
-        :param is_single: True if this piece is a 1x1 piece and False otherwise.
-        :type is_single: bool
-        :param coord_x: The x coordinate of the top left corner of the piece.
-        :type coord_x: int
-        :param coord_y: The y coordinate of the top left corner of the piece.
-        :type coord_y: int
-        :param orientation: The orientation of the piece (one of 'h' or 'v') 
-            if the piece is a 1x2 piece. Otherwise, this is None
-        :type orientation: str
-        """
-
-        self.is_2_by_2 = is_2_by_2
-        self.is_single = is_single
-        self.coord_x = coord_x
-        self.coord_y = coord_y
-        self.orientation = orientation
-
-    def set_coords(self, coord_x, coord_y):
-        """
-        Move the piece to the new coordinates. 
-
-        :param coord: The new coordinates after moving.
-        :type coord: int
-        """
-
-        self.coord_x = coord_x
-        self.coord_y = coord_y
-
-    def __repr__(self):
-        return '2by2:{} single:{} x:{} y:{} orientation:{}'.format(self.is_2_by_2, self.is_single, \
-                                                                   self.coord_x, self.coord_y, self.orientation)
-
-
-class Board:
-    """
-    Board class for setting up the playing board.
-    """
-
-    def __init__(self, height, pieces):
-        """
-        :param pieces: The list of Pieces
-        :type pieces: List[Piece]
-        """
-
-        self.width = 4
-        self.height = height
-        self.pieces = pieces
-
-        # self.grid is a 2-d (size * size) array automatically generated
-        # using the information on the pieces when a board is being created.
-        # A grid contains the symbol for representing the pieces on the board.
-        self.grid = []
-        self.__construct_grid()
-
-        self.blanks = []
-
-    # customized eq for object comparison.
-    def __eq__(self, other):
-        if isinstance(other, Board):
-            return self.grid == other.grid
-        return False
-
-    def __construct_grid(self):
-        """
-        Called in __init__ to set up a 2-d grid based on the piece location information.
-
-        """
-
-        for i in range(self.height):
-            line = []
-            for j in range(self.width):
-                line.append('.')
-            self.grid.append(line)
-
-        for piece in self.pieces:
-            if piece.is_2_by_2:
-                self.grid[piece.coord_y][piece.coord_x] = '1'
-                self.grid[piece.coord_y][piece.coord_x + 1] = '1'
-                self.grid[piece.coord_y + 1][piece.coord_x] = '1'
-                self.grid[piece.coord_y + 1][piece.coord_x + 1] = '1'
-            elif piece.is_single:
-                self.grid[piece.coord_y][piece.coord_x] = char_single
-            else:
-                if piece.orientation == 'h':
-                    self.grid[piece.coord_y][piece.coord_x] = '<'
-                    self.grid[piece.coord_y][piece.coord_x + 1] = '>'
-                elif piece.orientation == 'v':
-                    self.grid[piece.coord_y][piece.coord_x] = '^'
-                    self.grid[piece.coord_y + 1][piece.coord_x] = 'v'
-
-    def display(self):
-        """
-        Print out the current board.
-
-        """
-        for i, line in enumerate(self.grid):
-            for ch in line:
-                print(ch, end='')
-            print()
-
-
-class State:
-    """
-    State class wrapping a Board with some extra current state information.
-    Note that State and Board are different. Board has the locations of the pieces.
-    State has a Board and some extra information that is relevant to the search:
-    heuristic function, f value, current depth and parent.
-    """
-
-    def __init__(self, board, hfn, f, depth, g, parent=None):
-        """
-        :param board: The board of the state.
-        :type board: Board
-        :param hfn: The heuristic function.
-        :type hfn: Optional[Heuristic]
-        :param f: The f value of current state.
-        :type f: int
-        :param depth: The depth of current state in the search tree.
-        :type depth: int
-        :param g: The g value of current state..
-        :type g: int
-        :param parent: The parent of current state.
-        :type parent: Optional[State]
-        """
-        self.board = board
-        self.hfn = hfn
-        self.f = f
-        self.depth = depth
-        self.g = g
-        self.parent = parent
-        self.path = []
-
-    def __lt__(self, other):
-        return self.f < other.f
-
-
-class Stack:
-    def __init__(self):
-        self.items = []
-
-    def is_empty(self):
-        return len(self.items) == 0
-
-    def push(self, item):
-        self.items.append(item)
-
-    def pop(self):
-        if not self.is_empty():
-            return self.items.pop()
-        else:
-            raise IndexError("pop from empty stack")
-
-
-class PriorityQueue:
-    def __init__(self):
-        self.heap = []
-        self.count = 0
-
-    def insert(self, item):
-        # Use a tuple (item.f, count, item) to ensure the heap is ordered by item.f
-        heapq.heappush(self.heap, (item.f, self.count, item))
-        self.count += 1
-
-    def extract(self):
-        # Pop the smallest item from the heap
-        return heapq.heappop(self.heap)[2]
-
-    def is_empty(self):
-        return len(self.heap) == 0
-
-
-def read_from_file(filename):
-    """
-    Load initial board from a given file.
-
-    :param filename: The name of the given file.
-    :type filename: str
-    :return: A loaded board
-    :rtype: Board
-    """
-
-    puzzle_file = open(filename, "r")
-
-    line_index = 0
-    pieces = []
-    final_pieces = []
-    final = False
-    found_2by2 = False
-    finalfound_2by2 = False
-    height_ = 0
-
-    for line in puzzle_file:
-        height_ += 1
-        if line == '\n':
-            if not final:
-                height_ = 0
-                final = True
-                line_index = 0
-            continue
-        if not final:  # initial board
-            for x, ch in enumerate(line):
-                if ch == '^':  # found vertical piece
-                    pieces.append(Piece(False, False, x, line_index, 'v'))
-                elif ch == '<':  # found horizontal piece
-                    pieces.append(Piece(False, False, x, line_index, 'h'))
-                elif ch == char_single:
-                    pieces.append(Piece(False, True, x, line_index, None))
-                elif ch == '1':
-                    if found_2by2 == False:
-                        pieces.append(Piece(True, False, x, line_index, None))
-                        found_2by2 = True
-        else:  # goal board
-            for x, ch in enumerate(line):
-                if ch == '^':  # found vertical piece
-                    final_pieces.append(Piece(False, False, x, line_index, 'v'))
-                elif ch == '<':  # found horizontal piece
-                    final_pieces.append(Piece(False, False, x, line_index, 'h'))
-                elif ch == char_single:
-                    final_pieces.append(Piece(False, True, x, line_index, None))
-                elif ch == '1':
-                    if finalfound_2by2 == False:
-                        final_pieces.append(Piece(True, False, x, line_index, None))
-                        finalfound_2by2 = True
-        line_index += 1
-
-    puzzle_file.close()
-    board = Board(height_, pieces)
-    goal_board = Board(height_, final_pieces)
-    return board, goal_board
-
-
-def find_legal(piece, empty_squares) -> list:
-    """
-        find legal moves for <piece> given a list of coordinates for empty squares
-        returns a list of directions <piece> can move in. Directions include "down", "up", "right", and "left".
-        """
-    directions = []
-    if piece.is_2_by_2:
-        if ((piece.coord_x, piece.coord_y + 2) in empty_squares) and ((piece.coord_x + 1, piece.coord_y + 2) in
-                                                                      empty_squares):
-            directions.append("down")
-        if ((piece.coord_x, piece.coord_y - 1) in empty_squares) and ((piece.coord_x + 1, piece.coord_y - 1) in
-                                                                      empty_squares):
-            directions.append("up")
-        if ((piece.coord_x + 2, piece.coord_y) in empty_squares) and ((piece.coord_x + 2, piece.coord_y + 1) in
-                                                                      empty_squares):
-            directions.append("right")
-        if ((piece.coord_x - 1, piece.coord_y) in empty_squares) and ((piece.coord_x - 1, piece.coord_y + 1) in
-                                                                      empty_squares):
-            directions.append("left")
-    if piece.orientation == "h":
-        if ((piece.coord_x, piece.coord_y + 1) in empty_squares) and ((piece.coord_x + 1, piece.coord_y + 1) in
-                                                                      empty_squares):
-            directions.append("down")
-        if ((piece.coord_x, piece.coord_y - 1) in empty_squares) and ((piece.coord_x + 1, piece.coord_y - 1) in
-                                                                      empty_squares):
-            directions.append("up")
-        if (piece.coord_x + 2, piece.coord_y) in empty_squares:
-            directions.append("right")
-        if (piece.coord_x - 1, piece.coord_y) in empty_squares:
-            directions.append("left")
-    if piece.is_single:
-        if (piece.coord_x, piece.coord_y + 1) in empty_squares:
-            directions.append("down")
-        if (piece.coord_x, piece.coord_y - 1) in empty_squares:
-            directions.append("up")
-        if (piece.coord_x + 1, piece.coord_y) in empty_squares:
-            directions.append("right")
-        if (piece.coord_x - 1, piece.coord_y) in empty_squares:
-            directions.append("left")
-    if piece.orientation == "v":
-        if (piece.coord_x, piece.coord_y + 2) in empty_squares:
-            directions.append("down")
-        if (piece.coord_x, piece.coord_y - 1) in empty_squares:
-            directions.append("up")
-        if ((piece.coord_x + 1, piece.coord_y) in empty_squares) and ((piece.coord_x + 1, piece.coord_y + 1) in
-                                                                      empty_squares):
-            directions.append("right")
-        if ((piece.coord_x - 1, piece.coord_y) in empty_squares) and ((piece.coord_x - 1, piece.coord_y + 1) in
-                                                                      empty_squares):
-            directions.append("left")
-    return directions
-
-
-def find_successors(state, goal_board):
-    """
-    returns a list of successor states for a given <state>
-    """
-    lst = []
-    board = state.board
-    pieces = board.pieces
-    empty_squares = find_blanks(state)
-    for piece in pieces:
-        legal_directions = find_legal(piece, empty_squares)
-        for direction in legal_directions:
-            lst.append(find_state(piece, state, direction, goal_board))
-    return lst
-
-
-def find_state(piece, state, direction, goal_board) -> State:
-    """
-        returns a State when <piece> is moved in <direction> from current <state>
-        """
-    board = state.board
-    new_pieces = []
-    for p in board.pieces:
-        if p == piece:
-            if direction == "down":
-                new_p = Piece(p.is_2_by_2, p.is_single, p.coord_x, p.coord_y + 1, p.orientation)
-                new_pieces.append(new_p)
-            elif direction == "up":
-                new_p = Piece(p.is_2_by_2, p.is_single, p.coord_x, p.coord_y - 1, p.orientation)
-                new_pieces.append(new_p)
-            elif direction == "right":
-                new_p = Piece(p.is_2_by_2, p.is_single, p.coord_x + 1, p.coord_y, p.orientation)
-                new_pieces.append(new_p)
-            elif direction == "left":
-                new_p = Piece(p.is_2_by_2, p.is_single, p.coord_x - 1, p.coord_y, p.orientation)
-                new_pieces.append(new_p)
-        else:
-            new_pieces.append(p)
-    new_board = Board(height=board.height, pieces=new_pieces)
-    f = heuristic_function(new_board, goal_board) + state.g + 1
-    new_state = State(board=new_board, hfn=heuristic_function(new_board, goal_board), f=f, depth=state.depth + 1,
-                      g=state.g + 1,
-                      parent=state)
-    return new_state
-
-
-def find_blanks(state):
-    """
-    returns coordinates of the blank sqares of a board
-    """
-    lst = []
-    grid = state.board.grid
-    for i in range(len(grid)):
-        for j in range(len(grid[i])):
-            if grid[i][j] == '.':
-                lst.append((j, i))
-    return lst
-
-
-def grid_to_string(grid):
-    """
-        Returns a string version of Board.grid
-        """
-    return '\n'.join([''.join(row) for row in grid])
-
-
-def heuristic_function(board: Board, goal_board: Board) -> int:
-    """
-        returns a heuristic given <board> and <goal_board>
-        """
-    distance = 0
-    goal_set = {"single": [], "2by2": [], "h": [], "v": []}
-    for p in goal_board.pieces:
-        if p.is_single:
-            goal_set["single"].append(p)
-        elif p.is_2_by_2:
-            goal_set["2by2"].append(p)
-        elif p.orientation == "h":
-            goal_set["h"].append(p)
-        elif p.orientation == "v":
-            goal_set["v"].append(p)
-
-    for piece in board.pieces:
-        min = float('inf')
-        min_p = None
-        if piece.is_single:
-            for p2 in goal_set["single"]:
-                d = find_distance(piece.coord_x, piece.coord_y, p2.coord_x, p2.coord_y)
-                if d < min:
-                    min = d
-                    min_p = p2
-            goal_set["single"].remove(min_p)
-        elif piece.is_2_by_2:
-            for p2 in goal_set["2by2"]:
-                d = find_distance(piece.coord_x, piece.coord_y, p2.coord_x, p2.coord_y)
-                if d < min:
-                    min = d
-                    min_p = p2
-            goal_set["2by2"].remove(min_p)
-        elif piece.orientation == "h":
-            for p2 in goal_set["h"]:
-                d = find_distance(piece.coord_x, piece.coord_y, p2.coord_x, p2.coord_y)
-                if d < min:
-                    min = d
-                    min_p = p2
-            goal_set["h"].remove(min_p)
-        elif piece.orientation == "v":
-            for p2 in goal_set["v"]:
-                d = find_distance(piece.coord_x, piece.coord_y, p2.coord_x, p2.coord_y)
-                if d < min:
-                    min = d
-                    min_p = p2
-            goal_set["v"].remove(min_p)
-
-        distance += min
-
-    return distance
-
-
-def find_distance(curr_x, curr_y, goal_x, goal_y) -> tuple:
-    """
-    Returns the manhattan distance between two coordinates.
-    """
-    return abs(curr_x - goal_x) + abs(curr_y - goal_y)
-
-
-def astar(board, goal_board) -> str:
-    """
-        returns path from <board> to <goal_board> using a* search
-        """
-    f = heuristic_function(board, goal_board)
-    start = State(board, heuristic_function(board, goal_board), f, 0, 0, None)
-    start.path = [start.board.grid]
-
-    frontier = PriorityQueue()
-    frontier.insert(start)
-    visited_grids = set()
-
-    while not frontier.is_empty():
-        curr = frontier.extract()
-        curr_grid_tuple = tuple(map(tuple, curr.board.grid))
-
-        if curr_grid_tuple in visited_grids:
-            continue
-        else:
-            visited_grids.add(curr_grid_tuple)
-            if curr.board == goal_board:
-                return "\n\n".join(grid_to_string(path) for path in curr.path)
-            else:
-                successors = find_successors(curr, goal_board)
-                for successor in successors:
-                    successor.path = curr.path + [successor.board.grid]
-                    frontier.insert(successor)
-
-    return "No solution"
-
-
-def dfs(board, goal_board) -> str:
-    """
-    returns path from <board> to <goal_board> using depth-first-search (DFS)
-    """
-    path = ""
-    f = heuristic_function(board, goal_board)
-    start = State(board, heuristic_function(board, goal_board), f, 0, 0, None)
-    frontier = Stack()
-    frontier.push(start)
-    visited_grids = set()
-    while not frontier.is_empty():
-        curr = frontier.pop()
-        curr_grid_tuple = tuple(map(tuple, curr.board.grid))
-        path += grid_to_string(curr.board.grid) + "\n\n" #add to the path here
-        if curr_grid_tuple in visited_grids:
-            pass
-        else:
-            visited_grids.add(curr_grid_tuple)
-            # path += grid_to_string(curr.board.grid) #moved above
-            if curr.board == goal_board:
-                return path
-            else:
-                successors = find_successors(curr, goal_board)
-                for successor in successors:
-                    frontier.push(successor)
-
-    return "No solution"
-if __name__ == "__main__":
-
-    parser = argparse.ArgumentParser()
-    parser.add_argument(
-        "--inputfile",
-        type=str,
-        required=True,
-        help="The input file that contains the puzzles."
-    )
-    parser.add_argument(
-        "--outputfile",
-        type=str,
-        required=True,
-        help="The output file that contains the solution."
-    )
-    parser.add_argument(
-        "--algo",
-        type=str,
-        required=True,
-        choices=['astar', 'dfs'],
-        help="The searching algorithm."
-    )
-    args = parser.parse_args()
-
-    # read the board from the file
-    board, goal_board = read_from_file(args.inputfile)
-
-    if args.algo == "astar":
-        solution = astar(board, goal_board)
-    elif args.algo == "dfs":
-        solution = dfs(board, goal_board)
-
-    with open(args.outputfile, "w") as f:
-        f.write(solution + "\n\n")
-
-    # An example of how to write solutions to the outputfile. (This is not a correct solution, of course).
-    # with open(args.outputfile, 'w') as sys.stdout:
-    #    board.display()
-    #    print("")
+import argparse
+import fnmatch
+import glob
+import hashlib
+import multiprocessing
+import sys
+import pdb
+import heapq
+import io
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zlib
+
+# ====================================================================================
+
+char_single = '2'
+
+# Solutions are written through a buffer of this many bytes.
+OUTPUT_BUFFER = 1 << 16
+
+
+class Piece:
+    """
+    This represents a piece on the Hua Rong Dao puzzle.
+
+    Boards share their Piece objects, so a Piece cannot be changed after it is
+    made; Board.move makes a new one for the piece it moves.
+    """
+
+    __slots__ = ('is_2_by_2', 'is_single', 'coord_x', 'coord_y', 'orientation')
+
+    def __init__(self, is_2_by_2, is_single, coord_x, coord_y, orientation):
+        """
+        :param is_2_by_2: True if the piece is a 2x2 piece and False otherwise.
+        :type is_2_by_2: bool
+        :param is_single: True if this piece is a 1x1 piece and False otherwise.
+        :type is_single: bool
+        :param coord_x: The x coordinate of the top left corner of the piece.
+        :type coord_x: int
+        :param coord_y: The y coordinate of the top left corner of the piece.
+        :type coord_y: int
+        :param orientation: The orientation of the piece (one of 'h' or 'v') 
+            if the piece is a 1x2 piece. Otherwise, this is None
+        :type orientation: str
+        """
+
+        set_field = object.__setattr__
+        set_field(self, 'is_2_by_2', is_2_by_2)
+        set_field(self, 'is_single', is_single)
+        set_field(self, 'coord_x', coord_x)
+        set_field(self, 'coord_y', coord_y)
+        set_field(self, 'orientation', orientation)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("a Piece cannot be changed; use Board.move to move it")
+
+    def __delattr__(self, name):
+        raise AttributeError("a Piece cannot be changed; use Board.move to move it")
+
+    def __repr__(self):
+        return '2by2:{} single:{} x:{} y:{} orientation:{}'.format(self.is_2_by_2, self.is_single, \
+                                                                   self.coord_x, self.coord_y, self.orientation)
+
+
+class Board:
+    """
+    Board class for setting up the playing board.
+
+    Boards made by move share their unchanged grid rows and Piece objects with
+    the board they came from, so they are never modified after construction.
+    """
+
+    __slots__ = ('width', 'height', 'pieces', 'grid', 'blanks')
+
+    def __init__(self, height, pieces, grid=None, blanks=None):
+        """
+        :param pieces: The Pieces, stored as a tuple.
+        :type pieces: Iterable[Piece]
+        :param grid: A grid already matching <pieces>, as built by Board.move.
+        :type grid: Optional[List[str]]
+        :param blanks: The coordinates of the blank squares of <grid>, if known.
+            Otherwise they are found here.
+        :type blanks: Optional[Tuple[Tuple[int, int], ...]]
+        """
+
+        self.width = len(grid[0]) if grid else WIDTH
+        self.height = height
+        self.pieces = tuple(pieces)
+
+        # self.grid is a list of rows automatically generated using the
+        # information on the pieces when a board is being created. A row is a
+        # string holding the symbol of the piece on each square, and identical
+        # rows are shared between boards (see shared_row).
+        if grid is None:
+            self.grid = []
+            self.__construct_grid()
+        else:
+            self.grid = grid
+
+        if blanks is None:
+            blanks = tuple(shared_square(x, y) for y, row in enumerate(self.grid)
+                           for x, ch in enumerate(row) if ch == '.')
+        self.blanks = blanks
+
+    # customized eq for object comparison.
+    def __eq__(self, other):
+        if isinstance(other, Board):
+            return self.grid == other.grid
+        return False
+
+    def __construct_grid(self):
+        """
+        Called in __init__ to set up a 2-d grid based on the piece location information.
+
+        """
+
+        for i in range(self.height):
+            line = []
+            for j in range(self.width):
+                line.append('.')
+            self.grid.append(line)
+
+        for piece in self.pieces:
+            if piece.is_2_by_2:
+                self.grid[piece.coord_y][piece.coord_x] = '1'
+                self.grid[piece.coord_y][piece.coord_x + 1] = '1'
+                self.grid[piece.coord_y + 1][piece.coord_x] = '1'
+                self.grid[piece.coord_y + 1][piece.coord_x + 1] = '1'
+            elif piece.is_single:
+                self.grid[piece.coord_y][piece.coord_x] = char_single
+            else:
+                if piece.orientation == 'h':
+                    self.grid[piece.coord_y][piece.coord_x] = '<'
+                    self.grid[piece.coord_y][piece.coord_x + 1] = '>'
+                elif piece.orientation == 'v':
+                    self.grid[piece.coord_y][piece.coord_x] = '^'
+                    self.grid[piece.coord_y + 1][piece.coord_x] = 'v'
+
+        self.grid = [shared_row(''.join(line)) for line in self.grid]
+
+    def move(self, piece, direction):
+        """
+        Return a new Board with <piece> slid one square in <direction>.
+
+        Grid rows are shared with this board except for the ones the piece touches,
+        which are rebuilt, and the blank squares are carried over, so the cost is
+        proportional to the size of the piece rather than the board.
+
+        :param piece: The piece to move, which must be one of self.pieces.
+        :type piece: Piece
+        :param direction: One of "down", "up", "right" or "left".
+        :type direction: str
+        :return: The board after the move.
+        :rtype: Board
+        """
+
+        dx, dy = DIRECTION_OFFSETS[direction]
+        moved = Piece(piece.is_2_by_2, piece.is_single, piece.coord_x + dx, piece.coord_y + dy,
+                      piece.orientation)
+        index = self.pieces.index(piece)
+        pieces = self.pieces[:index] + (moved,) + self.pieces[index + 1:]
+
+        old_cells = piece_cells(piece)
+        new_cells = piece_cells(moved)
+        grid = self.grid[:]
+        top = min(old_cells[0][1], new_cells[0][1])
+        bottom = max(old_cells[-1][1], new_cells[-1][1])
+        rows = {y: list(grid[y]) for y in range(top, bottom + 1)}
+        for x, y, _ in old_cells:
+            rows[y][x] = '.'
+        for x, y, ch in new_cells:
+            rows[y][x] = ch
+        for y, row in rows.items():
+            grid[y] = shared_row(''.join(row))
+
+        blanks = None
+        if self.blanks:
+            blanks = [square for square in self.blanks if grid[square[1]][square[0]] == '.']
+            for x, y, _ in old_cells:
+                if grid[y][x] == '.':
+                    blanks.append(shared_square(x, y))
+            blanks = tuple(blanks)
+
+        return Board(self.height, pieces, grid, blanks)
+
+    def display(self):
+        """
+        Print out the current board.
+
+        """
+        for i, line in enumerate(self.grid):
+            for ch in line:
+                print(ch, end='')
+            print()
+
+
+class State:
+    """
+    State class wrapping a Board with some extra current state information.
+    Note that State and Board are different. Board has the locations of the pieces.
+    State has a Board and some extra information that is relevant to the search:
+    heuristic function, f value, current depth and parent.
+
+    With slots, tuple piece lists and shared grid rows and squares, a frontier
+    state costs about 500 bytes including its Board, down from about 1030
+    bytes with per-instance dicts (measured with tracemalloc on hard1.txt).
+    """
+
+    __slots__ = ('board', 'hfn', 'f', 'depth', 'g', 'parent')
+
+    def __init__(self, board, hfn, f, depth, g, parent=None):
+        """
+        :param board: The board of the state.
+        :type board: Board
+        :param hfn: The heuristic function.
+        :type hfn: Optional[Heuristic]
+        :param f: The f value of current state.
+        :type f: int
+        :param depth: The depth of current state in the search tree.
+        :type depth: int
+        :param g: The g value of current state..
+        :type g: int
+        :param parent: The parent of current state.
+        :type parent: Optional[State]
+        """
+        self.board = board
+        self.hfn = hfn
+        self.f = f
+        self.depth = depth
+        self.g = g
+        self.parent = parent
+
+    def __lt__(self, other):
+        return self.f < other.f
+
+
+class Stack:
+    def __init__(self):
+        self.items = []
+
+    def is_empty(self):
+        return len(self.items) == 0
+
+    def push(self, item):
+        self.items.append(item)
+
+    def pop(self):
+        if not self.is_empty():
+            return self.items.pop()
+        else:
+            raise IndexError("pop from empty stack")
+
+    def __len__(self):
+        return len(self.items)
+
+
+class PriorityQueue:
+    """
+    A heap of states ordered by f. A state inserted with a key is only pushed if
+    no state with that key was inserted before with an equal or lower g, so the
+    heap never holds a duplicate that cannot improve on one already queued or
+    expanded.
+    """
+
+    def __init__(self):
+        self.heap = []
+        self.count = 0
+        # The lowest g each key has been inserted with.
+        self.best_g = {}
+
+    def insert(self, item, key=None) -> bool:
+        # Returns False if <item> was dropped as a duplicate of <key>
+        if key is not None:
+            best = self.best_g.get(key)
+            if best is not None and best <= item.g:
+                return False
+            self.best_g[key] = item.g
+        self.push(item)
+        return True
+
+    def push(self, item):
+        # Use a tuple (item.f, count, item) to ensure the heap is ordered by item.f
+        heapq.heappush(self.heap, (item.f, self.count, item))
+        self.count += 1
+
+    def extract(self):
+        # Pop the smallest item from the heap
+        return heapq.heappop(self.heap)[2]
+
+    def is_empty(self):
+        return len(self.heap) == 0
+
+    def __len__(self):
+        return len(self.heap)
+
+
+class BucketQueue(PriorityQueue):
+    """
+    A PriorityQueue kept as an array of buckets indexed by f and then by g, for
+    states whose f and g are small non-negative integers. extract returns a state
+    with the lowest f and, among those, the highest g, so the search runs deep
+    along an f-plateau instead of widening it. Both take O(1) amortized time.
+
+    A state with an infinite f, which a heuristic such as a pattern database gives
+    a board that cannot reach the goal, is a dead end and is dropped.
+    """
+
+    def __init__(self):
+        super().__init__()
+        # buckets[f][g] is a stack of the queued states with that f and g.
+        self.buckets = []
+        self.min_f = 0
+        self.size = 0
+
+    def push(self, item):
+        f, g = item.f, item.g
+        if f == float('inf'):
+            return
+        while len(self.buckets) <= f:
+            self.buckets.append([])
+        row = self.buckets[f]
+        while len(row) <= g:
+            row.append([])
+        row[g].append(item)
+        if f < self.min_f or self.size == 0:
+            self.min_f = f
+        self.size += 1
+
+    def extract(self):
+        row = self.buckets[self.min_f]
+        while True:
+            # Trailing empty g stacks are dropped so the highest g is always last.
+            while row and not row[-1]:
+                row.pop()
+            if row:
+                break
+            self.min_f += 1
+            row = self.buckets[self.min_f]
+        self.size -= 1
+        return row[-1].pop()
+
+    def is_empty(self):
+        return self.size == 0
+
+    def __len__(self):
+        return self.size
+
+
+FRONTIERS = {"bucket": BucketQueue, "heap": PriorityQueue}
+
+
+class SearchStats:
+    """
+    Counters a search fills in when it is given one.
+
+    :param timed: Whether the search also times its heuristic and successor calls.
+    :type timed: bool
+    :param progress: If given, a progress line is printed to stderr about every
+        <progress> seconds.
+    :type progress: Optional[float]
+    """
+
+    def __init__(self, timed=False, progress=None):
+        self.expanded = 0
+        self.generated = 0
+        # Successors dropped before being queued because their state had already
+        # been queued or expanded at an equal or lower cost.
+        self.duplicates = 0
+        # The number of moves in the solution, or None if none was found. For dfs
+        # this is the depth of the goal, not the number of boards written.
+        self.solution_length = None
+        # Whether the solution was read from a SolutionCache instead of searched for.
+        self.cached = False
+        self.peak_frontier = 0
+        # Seconds spent in the heuristic and in successor generation when timed.
+        # The board engine scores successors as it makes them, so there the
+        # successor time includes the heuristic time.
+        self.heuristic_time = 0.0
+        self.successor_time = 0.0
+        self.timed = timed
+        self.progress = progress
+        self.started = time.perf_counter()
+        self.finished = None
+        self.next_report = self.started + (progress or 0)
+
+    def start(self):
+        """
+        Restart the clock, for stats made before the search is set up.
+        """
+        self.started = time.perf_counter()
+        self.finished = None
+        self.next_report = self.started + (self.progress or 0)
+
+    def finish(self):
+        """
+        Stop the clock.
+        """
+        self.finished = time.perf_counter()
+
+    def add(self, other):
+        """
+        Add the stats <other> of one search to these totals: the counts and times
+        add up, the peak frontier is the largest, and the solution length and
+        whether it was cached are those of <other>. The clock of the totals only
+        runs for the searches added, so start it before the first.
+        """
+        self.expanded += other.expanded
+        self.generated += other.generated
+        self.duplicates += other.duplicates
+        self.peak_frontier = max(self.peak_frontier, other.peak_frontier)
+        self.solution_length = other.solution_length
+        self.cached = other.cached
+        self.heuristic_time += other.heuristic_time
+        self.successor_time += other.successor_time
+        if self.finished is None:
+            self.finished = self.started
+        self.finished += other.elapsed
+
+    @property
+    def elapsed(self) -> float:
+        end = time.perf_counter() if self.finished is None else self.finished
+        return end - self.started
+
+    @property
+    def nodes_per_second(self) -> float:
+        elapsed = self.elapsed
+        return self.expanded / elapsed if elapsed > 0 else 0.0
+
+    def timer(self, field, function):
+        """
+        returns <function>, adding the time spent in it to the attribute <field>
+        when timed
+        """
+        if not self.timed:
+            return function
+
+        def timed_function(*args):
+            started = time.perf_counter()
+            try:
+                return function(*args)
+            finally:
+                setattr(self, field, getattr(self, field) + time.perf_counter() - started)
+
+        return timed_function
+
+    def update(self, frontier_size):
+        """
+        Record the size of the frontier after an expansion, and print a progress
+        line if one is due.
+        """
+        if frontier_size > self.peak_frontier:
+            self.peak_frontier = frontier_size
+        # The clock is only read every 1024 expansions.
+        if self.progress is not None and not self.expanded & 1023:
+            now = time.perf_counter()
+            if now >= self.next_report:
+                self.next_report = now + self.progress
+                print("[{:.1f}s] expanded {} generated {} frontier {} ({:.0f} nodes/s)".format(
+                    now - self.started, self.expanded, self.generated, frontier_size,
+                    self.nodes_per_second), file=sys.stderr)
+
+    def summary(self) -> str:
+        """
+        returns the counters and timings, one per line
+        """
+        lines = ["expanded:        {}".format(self.expanded),
+                 "generated:       {}".format(self.generated),
+                 "duplicates:      {}".format(self.duplicates),
+                 "peak frontier:   {}".format(self.peak_frontier),
+                 "solution length: {}".format(self.solution_length),
+                 "cached:          {}".format("yes" if self.cached else "no"),
+                 "time:            {:.3f}s".format(self.elapsed),
+                 "nodes/s:         {:.0f}".format(self.nodes_per_second)]
+        if self.timed:
+            lines.append("heuristic time:  {:.3f}s".format(self.heuristic_time))
+            lines.append("successor time:  {:.3f}s".format(self.successor_time))
+        return "\n".join(lines)
+
+
+def read_from_file(filename):
+    """
+    Load initial board from a given file.
+
+    The file is read by read_puzzles, and only its first puzzle is loaded. Boards
+    of another width than 4, or with pieces other than the standard ones, hold
+    only their grid and no Pieces, and can only be solved by the packed engine.
+
+    :param filename: The name of the given file.
+    :type filename: str
+    :return: A loaded board
+    :rtype: Board
+    """
+
+    puzzles = read_puzzles(filename)
+    if not puzzles:
+        raise ValueError("{} holds no puzzle".format(filename))
+    return puzzles[0].boards()
+
+
+DIRECTION_OFFSETS = {"down": (0, 1), "up": (0, -1), "right": (1, 0), "left": (-1, 0)}
+
+# Every distinct grid row and square coordinate is stored once and shared by all
+# the boards that use it.
+_shared_rows = {}
+_shared_squares = {}
+
+
+def shared_row(row) -> str:
+    """
+    returns the shared copy of the grid row <row>
+    """
+    return _shared_rows.setdefault(row, row)
+
+
+def shared_square(x, y) -> tuple:
+    """
+    returns the shared (x, y) tuple for a square
+    """
+    square = (x, y)
+    return _shared_squares.setdefault(square, square)
+
+
+def piece_cells(piece) -> list:
+    """
+    returns (x, y, symbol) for every square covered by <piece>
+    """
+    x = piece.coord_x
+    y = piece.coord_y
+    if piece.is_2_by_2:
+        return [(x, y, '1'), (x + 1, y, '1'), (x, y + 1, '1'), (x + 1, y + 1, '1')]
+    if piece.is_single:
+        return [(x, y, char_single)]
+    if piece.orientation == 'h':
+        return [(x, y, '<'), (x + 1, y, '>')]
+    return [(x, y, '^'), (x, y + 1, 'v')]
+
+
+def find_successors(state, goal_board, heuristic=None):
+    """
+    returns a list of successor states for a given <state>, scored with
+    <heuristic> (a GoalHeuristic for <goal_board>) when one is given
+    """
+    lst = []
+    board = state.board
+    pieces = board.pieces
+    tables = standard_layout(board.height).tables
+    occupied = tables.full
+    for x, y in find_blanks(state):
+        occupied ^= 1 << (y * WIDTH + x)
+    masks = tables.masks
+    for piece in pieces:
+        for direction, need in masks[piece_code(piece)][piece.coord_y * WIDTH + piece.coord_x]:
+            if not need & occupied:
+                lst.append(find_state(piece, state, direction, goal_board, heuristic))
+    return lst
+
+
+def find_state(piece, state, direction, goal_board, heuristic=None) -> State:
+    """
+        returns a State when <piece> is moved in <direction> from current <state>
+        """
+    new_board = state.board.move(piece, direction)
+    if heuristic is None:
+        hfn = heuristic_function(new_board, goal_board)
+    else:
+        hfn = heuristic(new_board)
+    new_state = State(board=new_board, hfn=hfn, f=hfn + state.g + 1, depth=state.depth + 1,
+                      g=state.g + 1,
+                      parent=state)
+    return new_state
+
+
+def find_blanks(state):
+    """
+    returns coordinates of the blank sqares of a board
+    """
+    return state.board.blanks
+
+
+def grid_to_string(grid):
+    """
+        Returns a string version of Board.grid
+        """
+    return '\n'.join([''.join(row) for row in grid])
+
+
+def heuristic_function(board: Board, goal_board: Board) -> int:
+    """
+        returns a heuristic given <board> and <goal_board>
+        """
+    distance = 0
+    goal_set = {"single": [], "2by2": [], "h": [], "v": []}
+    for p in goal_board.pieces:
+        if p.is_single:
+            goal_set["single"].append(p)
+        elif p.is_2_by_2:
+            goal_set["2by2"].append(p)
+        elif p.orientation == "h":
+            goal_set["h"].append(p)
+        elif p.orientation == "v":
+            goal_set["v"].append(p)
+
+    for piece in board.pieces:
+        min = float('inf')
+        min_p = None
+        if piece.is_single:
+            for p2 in goal_set["single"]:
+                d = find_distance(piece.coord_x, piece.coord_y, p2.coord_x, p2.coord_y)
+                if d < min:
+                    min = d
+                    min_p = p2
+            goal_set["single"].remove(min_p)
+        elif piece.is_2_by_2:
+            for p2 in goal_set["2by2"]:
+                d = find_distance(piece.coord_x, piece.coord_y, p2.coord_x, p2.coord_y)
+                if d < min:
+                    min = d
+                    min_p = p2
+            goal_set["2by2"].remove(min_p)
+        elif piece.orientation == "h":
+            for p2 in goal_set["h"]:
+                d = find_distance(piece.coord_x, piece.coord_y, p2.coord_x, p2.coord_y)
+                if d < min:
+                    min = d
+                    min_p = p2
+            goal_set["h"].remove(min_p)
+        elif piece.orientation == "v":
+            for p2 in goal_set["v"]:
+                d = find_distance(piece.coord_x, piece.coord_y, p2.coord_x, p2.coord_y)
+                if d < min:
+                    min = d
+                    min_p = p2
+            goal_set["v"].remove(min_p)
+
+        distance += min
+
+    return distance
+
+
+def find_distance(curr_x, curr_y, goal_x, goal_y) -> tuple:
+    """
+    Returns the manhattan distance between two coordinates.
+    """
+    return abs(curr_x - goal_x) + abs(curr_y - goal_y)
+
+
+def state_path(state) -> list:
+    """
+    returns the grids from the start state to <state>, following parent pointers
+    """
+    grids = []
+    while state is not None:
+        grids.append(state.board.grid)
+        state = state.parent
+    grids.reverse()
+    return grids
+
+
+def write_grids(grids, out):
+    """
+    Write every grid of <grids> to <out> as soon as it is produced, each one
+    followed by a blank line.
+    """
+    for grid in grids:
+        out.write(grid_to_string(grid))
+        out.write("\n\n")
+
+
+def astar(board, goal_board, heuristic=None, stats=None, frontier="heap") -> str:
+    """
+        returns path from <board> to <goal_board> using a* search, guided by
+        <heuristic> (a GoalHeuristic for <goal_board> by default)
+        """
+    goal_state = astar_search(board, goal_board, heuristic, stats, frontier)
+    if goal_state is None:
+        return "No solution"
+    return "\n\n".join(grid_to_string(grid) for grid in state_path(goal_state))
+
+
+def astar_search(board, goal_board, heuristic=None, stats=None, frontier="heap"):
+    """
+        returns the goal State reached by a* search from <board> to <goal_board>,
+        or None if there is no solution. <frontier> names the open list in
+        FRONTIERS: "bucket" breaks ties in f towards the highest g, "heap" towards
+        the oldest state. Closed states are never reopened, so with a heuristic
+        that is not consistent, such as GoalHeuristic, the tie-breaking can change
+        the length of the solution found.
+        """
+    if heuristic is None:
+        heuristic = GoalHeuristic(goal_board)
+    if stats is None:
+        stats = SearchStats()
+    heuristic = stats.timer('heuristic_time', heuristic)
+    successors_of = stats.timer('successor_time', find_successors)
+    f = heuristic(board)
+    start = State(board, f, f, 0, 0, None)
+
+    state_key = visited_key_function(goal_board)
+    frontier = FRONTIERS[frontier]()
+    frontier.insert(start, state_key(board))
+    visited_grids = set()
+
+    while not frontier.is_empty():
+        curr = frontier.extract()
+        curr_key = state_key(curr.board)
+
+        if curr_key in visited_grids:
+            continue
+        else:
+            visited_grids.add(curr_key)
+            if curr.board == goal_board:
+                stats.solution_length = curr.g
+                return curr
+            else:
+                successors = successors_of(curr, goal_board, heuristic)
+                stats.expanded += 1
+                stats.generated += len(successors)
+                for successor in successors:
+                    if not frontier.insert(successor, state_key(successor.board)):
+                        stats.duplicates += 1
+                stats.update(len(frontier))
+
+    return None
+
+
+def dfs(board, goal_board, heuristic=None, stats=None) -> str:
+    """
+    returns path from <board> to <goal_board> using depth-first-search (DFS)
+    """
+    out = io.StringIO()
+    if write_dfs(board, goal_board, out, heuristic, stats):
+        return out.getvalue()
+    return "No solution"
+
+
+def write_dfs(board, goal_board, out, heuristic=None, stats=None) -> bool:
+    """
+    Run depth-first-search (DFS) from <board> to <goal_board>, writing every board
+    to <out> as it is popped. Returns True if <goal_board> was reached.
+    """
+    if heuristic is None:
+        heuristic = GoalHeuristic(goal_board)
+    if stats is None:
+        stats = SearchStats()
+    heuristic = stats.timer('heuristic_time', heuristic)
+    successors_of = stats.timer('successor_time', find_successors)
+    f = heuristic(board)
+    start = State(board, f, f, 0, 0, None)
+    frontier = Stack()
+    frontier.push(start)
+    visited_grids = set()
+    state_key = visited_key_function(goal_board)
+    while not frontier.is_empty():
+        curr = frontier.pop()
+        curr_key = state_key(curr.board)
+        write_grids((curr.board.grid,), out) #add to the path here
+        if curr_key in visited_grids:
+            pass
+        else:
+            visited_grids.add(curr_key)
+            if curr.board == goal_board:
+                stats.solution_length = curr.depth
+                return True
+            else:
+                successors = successors_of(curr, goal_board, heuristic)
+                stats.expanded += 1
+                stats.generated += len(successors)
+                for successor in successors:
+                    frontier.push(successor)
+                stats.update(len(frontier))
+
+    return False
+
+
+# ====================================================================================
+# Packed state encoding.
+#
+# A board is packed into a single int holding a few bits per cell in row-major
+# order, where each cell stores the code of the piece square covering it. Identical
+# pieces are interchangeable, so the key is all the search needs for hashing,
+# successor generation and the goal test. A Board is only rebuilt when writing the
+# solution.
+#
+# Piece shapes are declared as data in PIECE_SHAPES. The cell codes, move tables,
+# mirror images and heuristics of the packed engine are all derived from the
+# shapes a puzzle uses and from the size of its board, which together make up its
+# Layout, so the packed engine solves boards of any width with any of the shapes.
+
+# Every piece shape, as the rows of symbols it draws ('.' where it leaves a square
+# of its bounding box uncovered). The first STANDARD_SHAPES are the pieces of the
+# original puzzle: they are read into Pieces by read_from_file and keep the cell
+# codes 1 to 6 on every board. The others are only given codes on boards that use
+# them, and are only searched by the packed engine.
+PIECE_SHAPES = (
+    ("11", "11"),
+    (char_single,),
+    ("<>",),
+    ("^", "v"),
+    ("[=]",),
+    ("A", "|", "V"),
+)
+STANDARD_SHAPES = 4
+
+# The width of the boards of the original puzzle, the only one the board engine
+# supports.
+WIDTH = 4
+
+# Moves are tried in this order, which fixes the order of the successors and so
+# the boards the dfs writes.
+DIRECTIONS = (("down", 0, 1), ("up", 0, -1), ("right", 1, 0), ("left", -1, 0))
+
+
+def shape_cells(rows) -> tuple:
+    """
+    returns (dx, dy, symbol) for every square of the shape drawn by <rows>, in
+    row-major order and relative to the first of them
+    """
+    cells = [(dx, dy, symbol) for dy, row in enumerate(rows) for dx, symbol in enumerate(row) if symbol != '.']
+    x, y, _ = cells[0]
+    return tuple((dx - x, dy - y, symbol) for dx, dy, symbol in cells)
+
+
+SHAPE_CELLS = tuple(shape_cells(rows) for rows in PIECE_SHAPES)
+# The symbol drawn on the first square of each shape, which names it in patterns.
+ANCHOR_SYMBOLS = tuple(cells[0][2] for cells in SHAPE_CELLS)
+
+
+def grid_pieces(grid) -> list:
+    """
+    returns (shape, x, y) for every piece drawn on <grid>, where shape indexes
+    PIECE_SHAPES and (x, y) is the first square of the piece in row-major order.
+
+    Squares are matched in row-major order, so the first square not yet covered is
+    always the first square of a piece, and pieces drawn with the same symbols are
+    split the same way they are packed.
+    """
+    covered = set()
+    pieces = []
+    height = len(grid)
+    for y, row in enumerate(grid):
+        for x, symbol in enumerate(row):
+            if symbol == '.' or (x, y) in covered:
+                continue
+            for shape, cells in enumerate(SHAPE_CELLS):
+                if all(0 <= y + dy < height and 0 <= x + dx < len(grid[y + dy])
+                       and grid[y + dy][x + dx] == ch and (x + dx, y + dy) not in covered
+                       for dx, dy, ch in cells):
+                    break
+            else:
+                raise ValueError("no piece shape matches square ({}, {}) of\n{}".format(x, y, grid_to_string(grid)))
+            covered.update((x + dx, y + dy) for dx, dy, _ in cells)
+            pieces.append((shape, x, y))
+    return pieces
+
+
+class PieceSet:
+    """
+    The cell codes of some of the PIECE_SHAPES. Every symbol of a shape gets its
+    own code, in the order the shapes are listed after EMPTY, so the standard
+    shapes always get the codes 1 to 6.
+
+    A shape drawn with a repeated symbol, such as the 2x2 piece, gets one code for
+    that symbol, which is only unambiguous while there is one such piece: two 2x2
+    pieces side by side would pack to a 2x4 block that also matches a 2x2 piece
+    across them. Shapes in <split> give every repeated square a further code of
+    its own, numbered after all the others, so they can appear any number of times.
+    """
+
+    def __init__(self, shapes, split=()):
+        """
+        :param shapes: Indices into PIECE_SHAPES, starting with the standard shapes.
+        :type shapes: Tuple[int, ...]
+        :param split: The shapes of <shapes> whose squares all get their own code.
+        :type split: Tuple[int, ...]
+        """
+        self.shapes = shapes
+        self.split = split
+        chars = ['.']
+        shape_codes = []
+        for shape in shapes:
+            codes = {}
+            for _, _, symbol in SHAPE_CELLS[shape]:
+                if symbol not in codes:
+                    codes[symbol] = len(chars)
+                    chars.append(symbol)
+            shape_codes.append([codes[symbol] for _, _, symbol in SHAPE_CELLS[shape]])
+        for shape, codes in zip(shapes, shape_codes):
+            if shape in split:
+                for index in range(len(codes)):
+                    if codes.index(codes[index]) != index:
+                        codes[index] = len(chars)
+                        chars.append(SHAPE_CELLS[shape][index][2])
+
+        self.chars = ''.join(chars)
+        self.cell_bits = max(1, (len(chars) - 1).bit_length())
+        self.cell_mask = (1 << self.cell_bits) - 1
+        # Symbols can only be packed one at a time when each has a single code.
+        self.codes = {ch: code for code, ch in enumerate(chars)} if len(set(chars)) == len(chars) else None
+        # The code of the first square of each shape, and of each anchor symbol.
+        self.anchors = {shape: codes[0] for shape, codes in zip(shapes, shape_codes)}
+        self.anchor_codes = {ANCHOR_SYMBOLS[shape]: code for shape, code in self.anchors.items()}
+        # (dx, dy, code) for every square of a piece, relative to its first square,
+        # and the set of codes of the piece, keyed by the code of its first square.
+        self.shape_cells = {}
+        self.shape_codes = {}
+        for shape, codes in zip(shapes, shape_codes):
+            self.shape_cells[codes[0]] = tuple((dx, dy, code) for (dx, dy, _), code in zip(SHAPE_CELLS[shape], codes))
+            self.shape_codes[codes[0]] = tuple(sorted(set(codes)))
+
+        # The code each code becomes in the left-right mirror image of a board, or
+        # None if some shape is not its own mirror image.
+        self.mirror = {0: 0}
+        for cells in self.shape_cells.values():
+            squares = {(dx, dy): code for dx, dy, code in cells}
+            columns = min(dx for dx, _ in squares) + max(dx for dx, _ in squares)
+            for (dx, dy), code in squares.items():
+                image = squares.get((columns - dx, dy))
+                if image is None or self.mirror.setdefault(code, image) != image:
+                    self.mirror = None
+                    break
+            if self.mirror is None:
+                break
+
+    def __reduce__(self):
+        # Rebuilt through piece_set, so a pickled PieceSet is the same object as
+        # the one already made for its shapes in the process that loads it.
+        return piece_set, (self.shapes, self.split)
+
+
+STANDARD_PIECES = PieceSet(tuple(range(STANDARD_SHAPES)))
+# The codes of the standard pieces, the same in every PieceSet.
+EMPTY, BLOCK, SINGLE, LEFT, RIGHT, UP, DOWN = range(len(STANDARD_PIECES.chars))
+
+
+class RowTable(dict):
+    """
+    A table from packed rows to <function> of them, computed the first time each
+    row is looked up, so wide rows cost nothing until they are met.
+    """
+
+    __slots__ = ('function',)
+
+    def __init__(self, function):
+        super().__init__()
+        self.function = function
+
+    def __missing__(self, row):
+        value = self[row] = self.function(row)
+        return value
+
+
+class Layout:
+    """
+    A board size together with the PieceSet of the pieces drawn on it, and the
+    tables the packed engine derives from them.
+    """
+
+    def __init__(self, pieces, width, height):
+        """
+        :param pieces: The shapes that can be on the board.
+        :type pieces: PieceSet
+        :param width: The number of columns of the board.
+        :type width: int
+        :param height: The number of rows of the board.
+        :type height: int
+        """
+        self.pieces = pieces
+        self.width = width
+        self.height = height
+        self.cell_bits = pieces.cell_bits
+        self.cell_mask = pieces.cell_mask
+        self.row_bits = pieces.cell_bits * width
+        self.row_mask = (1 << self.row_bits) - 1
+        # Whether the boards can be read into Pieces and searched by the board engine.
+        self.standard = pieces is STANDARD_PIECES and width == WIDTH
+        # For the code of the first square of a piece, the bits of the square indices
+        # the piece covers, shifted so that its first square is bit 0.
+        self.claims = [0] * len(pieces.chars)
+        for anchor, cells in pieces.shape_cells.items():
+            self.claims[anchor] = sum(1 << (dy * width + dx) for dx, dy, _ in cells)
+        self.tables = MoveTables(self)
+        self.mirror_rows = None if pieces.mirror is None else RowTable(self.mirror_row)
+        # Added to the names of stored tables so that boards packed with different
+        # codes never share one.
+        self.tag = "" if pieces is STANDARD_PIECES else "_{:08x}".format(
+            zlib.crc32(repr((pieces.shapes, pieces.split)).encode()))
+
+    def mirror_row(self, row) -> int:
+        """
+        returns the packed <row> reflected left to right
+        """
+        bits = self.cell_bits
+        mirror = self.pieces.mirror
+        mirrored = 0
+        for x in range(self.width):
+            code = (row >> (bits * x)) & self.cell_mask
+            mirrored |= mirror[code] << (bits * (self.width - 1 - x))
+        return mirrored
+
+    def __reduce__(self):
+        # Only the pieces and size are pickled; the tables are built again, once,
+        # by board_layout in the process that loads them.
+        return board_layout, (self.pieces, self.width, self.height)
+
+
+_layouts = {}
+
+
+def board_layout(pieces, width, height) -> Layout:
+    """
+    returns the Layout of <pieces> on a board of <width> by <height> squares,
+    building it once
+    """
+    layout = _layouts.get((pieces.shapes, pieces.split, width, height))
+    if layout is None:
+        layout = _layouts[pieces.shapes, pieces.split, width, height] = Layout(pieces, width, height)
+    return layout
+
+
+def standard_layout(height) -> Layout:
+    """
+    returns the Layout of the standard pieces on a 4-wide board of <height> rows
+    """
+    return board_layout(STANDARD_PIECES, WIDTH, height)
+
+
+_piece_sets = {}
+
+
+def piece_set(shapes, split=()) -> PieceSet:
+    """
+    returns the PieceSet of <shapes>, with the shapes in <split> split, building
+    it once
+    """
+    if shapes == STANDARD_PIECES.shapes and not split:
+        return STANDARD_PIECES
+    pieces = _piece_sets.get((shapes, split))
+    if pieces is None:
+        pieces = _piece_sets[shapes, split] = PieceSet(shapes, split)
+    return pieces
+
+
+def puzzle_layout(*boards) -> Layout:
+    """
+    returns the Layout of the pieces drawn on <boards>, which are the same size:
+    the standard shapes, any others used, and one code per square for shapes with
+    a repeated symbol used more than once on a board
+    """
+    board = boards[0]
+    if all(other.pieces for other in boards):
+        # Boards with Pieces were read by read_from_file as standard boards.
+        return standard_layout(board.height)
+    shapes = set(range(STANDARD_SHAPES))
+    split = set()
+    for other in boards:
+        counts = {}
+        for shape, _, _ in grid_pieces(other.grid):
+            counts[shape] = counts.get(shape, 0) + 1
+        shapes.update(counts)
+        split.update(shape for shape, count in counts.items()
+                      if count > 1 and len({ch for _, _, ch in SHAPE_CELLS[shape]}) < len(SHAPE_CELLS[shape]))
+    shapes = tuple(sorted(shapes))
+    split = tuple(sorted(split))
+    return board_layout(piece_set(shapes, split), len(board.grid[0]), board.height)
+
+
+def encode_grid(grid, layout=None) -> int:
+    """
+    returns the packed key of <grid>, drawn with the pieces of <layout> (the
+    standard pieces by default)
+    """
+    pieces = STANDARD_PIECES if layout is None else layout.pieces
+    codes = pieces.codes
+    bits = pieces.cell_bits
+    key = 0
+    if codes is None:
+        # Some symbol has several codes, so the pieces have to be found first.
+        width = len(grid[0])
+        for shape, x, y in grid_pieces(grid):
+            for dx, dy, code in pieces.shape_cells[pieces.anchors[shape]]:
+                key |= code << (bits * ((y + dy) * width + x + dx))
+        return key
+    shift = 0
+    for row in grid:
+        for ch in row:
+            key |= codes[ch] << shift
+            shift += bits
+    return key
+
+
+def decode_key(key, layout) -> list:
+    """
+    returns the grid packed in <key> for a board of <layout>
+    """
+    chars = layout.pieces.chars
+    bits = layout.cell_bits
+    mask = layout.cell_mask
+    grid = []
+    for y in range(layout.height):
+        row = []
+        for x in range(layout.width):
+            row.append(chars[key & mask])
+            key >>= bits
+        grid.append(row)
+    return grid
+
+
+def board_from_grid(grid) -> Board:
+    """
+    returns a Board with the pieces drawn on <grid>
+    """
+    pieces = []
+    found_2by2 = False
+    for y, row in enumerate(grid):
+        for x, ch in enumerate(row):
+            if ch == '^':
+                pieces.append(Piece(False, False, x, y, 'v'))
+            elif ch == '<':
+                pieces.append(Piece(False, False, x, y, 'h'))
+            elif ch == char_single:
+                pieces.append(Piece(False, True, x, y, None))
+            elif ch == '1' and not found_2by2:
+                pieces.append(Piece(True, False, x, y, None))
+                found_2by2 = True
+    return Board(len(grid), pieces)
+
+
+def key_to_board(key, layout) -> Board:
+    """
+    returns the Board packed in <key>. Boards of other layouts than the standard
+    one only hold their grid.
+    """
+    grid = decode_key(key, layout)
+    if layout.standard:
+        return board_from_grid(grid)
+    return Board(layout.height, (), [shared_row(''.join(row)) for row in grid])
+
+
+def key_pieces(key, layout) -> list:
+    """
+    returns (code, x, y) for the first square of every piece packed in <key>, in
+    row-major order, where code is the code of that square
+    """
+    pieces = []
+    claims = layout.claims
+    bits = layout.cell_bits
+    mask = layout.cell_mask
+    width = layout.width
+    # The squares of the pieces found so far. The first square not yet claimed is
+    # always the first square of a piece.
+    claimed = 0
+    index = 0
+    while key:
+        claim = claims[key & mask]
+        if claim and not (claimed >> index) & 1:
+            pieces.append((key & mask, index % width, index // width))
+            claimed |= claim << index
+        key >>= bits
+        index += 1
+    return pieces
+
+
+class MoveTables:
+    """
+    The moves of every piece shape from every square of a board, precomputed so
+    that testing a move is a single AND.
+
+    For the code of the first square of a piece and the index y * width + x of
+    that square: masks[code][index] holds (direction, need) pairs, where need has
+    one bit set for every square the move needs blank, and a move is legal when
+    need shares no bit with the occupied squares. deltas[code][index] holds (need,
+    delta, moved) triples over packed keys, where need covers the cell bits of
+    those squares, so the move is legal when key & need is 0 (blank is code 0), key
+    + delta applies it, and moved is the index of the piece afterwards. Moves off
+    the board are left out of both.
+
+    blank_moves[index] lists, for each neighbour of the square index, the moves
+    that slide the piece on that neighbour into it, keyed by the neighbour's code,
+    as (piece mask, piece, need, delta). The piece is on the board when
+    key & piece mask == piece. A move that needs several blanks is only listed
+    under the first of them, so every move is found from exactly one blank.
+    """
+
+    def __init__(self, layout):
+        """
+        :param layout: The board size and pieces.
+        :type layout: Layout
+        """
+        width = layout.width
+        height = layout.height
+        bits = layout.cell_bits
+        cell_mask = layout.cell_mask
+        self.height = height
+        self.full = (1 << (width * height)) - 1
+        # Bit 0 of every square of a packed key.
+        self.low_bits = sum(1 << (bits * index) for index in range(width * height))
+        self.masks = {}
+        self.deltas = {}
+        blank_moves = [{} for _ in range(width * height)]
+        for code, shape in layout.pieces.shape_cells.items():
+            masks = []
+            deltas = []
+            for index in range(width * height):
+                x, y = index % width, index // width
+                moves = []
+                key_moves = []
+                old = {(x + dx, y + dy): c for dx, dy, c in shape}
+                if not all(0 <= cx < width and 0 <= cy < height for cx, cy in old):
+                    masks.append(())
+                    deltas.append(())
+                    continue
+                piece_mask = sum(cell_mask << (bits * (cy * width + cx)) for cx, cy in old)
+                piece = sum(c << (bits * (cy * width + cx)) for (cx, cy), c in old.items())
+                for direction, mx, my in DIRECTIONS:
+                    new = {(cx + mx, cy + my): c for (cx, cy), c in old.items()}
+                    if not all(0 <= cx < width and 0 <= cy < height for cx, cy in new):
+                        continue
+                    need = 0
+                    key_need = 0
+                    for cx, cy in new:
+                        if (cx, cy) not in old:
+                            need |= 1 << (cy * width + cx)
+                            key_need |= cell_mask << (bits * (cy * width + cx))
+                    delta = sum(c << (bits * (cy * width + cx)) for (cx, cy), c in new.items()) - piece
+                    moves.append((direction, need))
+                    key_moves.append((key_need, delta, index + my * width + mx))
+
+                    first = (need & -need).bit_length() - 1
+                    neighbour = first - my * width - mx
+                    by_code = blank_moves[first].setdefault(neighbour, {})
+                    neighbour_code = old[(neighbour % width, neighbour // width)]
+                    by_code.setdefault(neighbour_code, []).append((piece_mask, piece, key_need, delta))
+                masks.append(tuple(moves))
+                deltas.append(tuple(key_moves))
+            self.masks[code] = masks
+            self.deltas[code] = deltas
+        self.blank_moves = [tuple((bits * neighbour, {c: tuple(entries) for c, entries in by_code.items()})
+                                  for neighbour, by_code in sorted(moves.items()))
+                            for moves in blank_moves]
+
+
+def key_successors(key, layout) -> list:
+    """
+    returns the keys reachable from <key> by sliding one piece by one square.
+
+    Only the pieces next to a blank square are looked at, so the work done is
+    proportional to the number of moves rather than the number of pieces.
+    """
+    tables = layout.tables
+    blank_moves = tables.blank_moves
+    bits = layout.cell_bits
+    mask = layout.cell_mask
+    occupied = key
+    for bit in range(1, bits):
+        occupied |= key >> bit
+    blanks = ~occupied & tables.low_bits
+    successors = []
+    while blanks:
+        low = blanks & -blanks
+        blanks ^= low
+        for shift, by_code in blank_moves[(low.bit_length() - 1) // bits]:
+            moves = by_code.get((key >> shift) & mask)
+            if moves is not None:
+                for piece_mask, piece, need, delta in moves:
+                    if key & piece_mask == piece and not key & need:
+                        successors.append(key + delta)
+    return successors
+
+
+def piece_code(piece) -> int:
+    """
+    returns the cell code of the top left square of <piece>
+    """
+    if piece.is_2_by_2:
+        return BLOCK
+    if piece.is_single:
+        return SINGLE
+    if piece.orientation == "h":
+        return LEFT
+    return UP
+
+
+class GoalHeuristic:
+    """
+    The greedy manhattan estimate of heuristic_function, precomputed for one goal.
+
+    For every piece class and every square of the board, a table holds the distance
+    to each goal position of that class. The greedy assignment cost of a sequence of
+    squares is memoized per class, so scoring a board costs one pass over its pieces
+    plus a dictionary lookup per class.
+    """
+
+    def __init__(self, goal_board, layout=None):
+        """
+        :param goal_board: The goal board.
+        :type goal_board: Board
+        :param layout: The Layout boards are packed with (the one of <goal_board>
+            by default).
+        :type layout: Optional[Layout]
+        """
+        if layout is None:
+            layout = puzzle_layout(goal_board)
+        self.layout = layout
+        self.width = layout.width
+        self.height = layout.height
+        # The goal coordinates of each piece class, keyed by the code of the first
+        # square of its pieces.
+        self.goal_set = {code: [] for code in layout.pieces.shape_cells}
+        for code, x, y in key_pieces(encode_grid(goal_board.grid, layout), layout):
+            self.goal_set[code].append((x, y))
+        self.tables = {}
+        for code, coords in self.goal_set.items():
+            self.tables[code] = [tuple(find_distance(x, y, gx, gy) for gx, gy in coords)
+                                 for y in range(self.height) for x in range(self.width)]
+        self.costs = {code: {} for code in self.goal_set}
+
+    def cost(self, code, cells) -> int:
+        """
+        returns the greedy assignment cost of pieces of class <code> whose top left
+        corners are on the square indices <cells>, matched in that order. It is
+        infinite if there are more of them than in the goal, as no move changes
+        the pieces on a board.
+        """
+        costs = self.costs[code]
+        value = costs.get(cells)
+        if value is None:
+            table = self.tables[code]
+            remaining = list(range(len(self.goal_set[code])))
+            if len(cells) > len(remaining):
+                costs[cells] = float('inf')
+                return costs[cells]
+            value = 0
+            for cell in cells:
+                distances = table[cell]
+                best = min(remaining, key=distances.__getitem__)
+                remaining.remove(best)
+                value += distances[best]
+            costs[cells] = value
+        return value
+
+    def __call__(self, board) -> int:
+        """
+        returns the estimate for <board>, equal to heuristic_function(board, goal)
+        """
+        width = self.width
+        cells = {code: [] for code in self.goal_set}
+        for piece in board.pieces:
+            cells[piece_code(piece)].append(piece.coord_y * width + piece.coord_x)
+        return sum(self.cost(code, tuple(c)) for code, c in cells.items())
+
+    def key_value(self, key) -> int:
+        """
+        returns the estimate for the board packed in <key>, matching its pieces in
+        row-major order
+        """
+        width = self.width
+        cells = {code: [] for code in self.goal_set}
+        for code, x, y in key_pieces(key, self.layout):
+            cells[code].append(y * width + x)
+        return sum(self.cost(code, tuple(c)) for code, c in cells.items())
+
+
+# ====================================================================================
+# Symmetry.
+#
+# A move and its mirror image are both legal or both illegal, so when the goal board
+# is its own left-right mirror a position and its mirror are the same distance from
+# the goal and only one of them needs to be searched. Identical pieces are already
+# folded together, since keys only record which square of which shape covers every
+# cell. Each Layout mirrors its rows through a RowTable built from PieceSet.mirror.
+
+def mirror_key(key, layout) -> int:
+    """
+    returns the key of the left-right mirror image of the board packed in <key>
+    """
+    rows = layout.mirror_rows
+    row_bits = layout.row_bits
+    row_mask = layout.row_mask
+    mirrored = 0
+    shift = 0
+    for _ in range(layout.height):
+        mirrored |= rows[(key >> shift) & row_mask] << shift
+        shift += row_bits
+    return mirrored
+
+
+def canonical_key(key, layout) -> int:
+    """
+    returns the smaller of <key> and its mirror image
+    """
+    mirrored = mirror_key(key, layout)
+    return mirrored if mirrored < key else key
+
+
+def goal_is_symmetric(goal_board, layout=None) -> bool:
+    """
+    returns True if <goal_board> is its own left-right mirror image. Boards of a
+    Layout with a shape that is not its own mirror image never are.
+    """
+    if layout is None:
+        layout = puzzle_layout(goal_board)
+    if layout.mirror_rows is None:
+        return False
+    goal = encode_grid(goal_board.grid, layout)
+    return mirror_key(goal, layout) == goal
+
+
+def visited_key_function(goal_board):
+    """
+    returns the function astar and dfs use to key a Board in their visited set.
+    Mirror images share a key when <goal_board> is symmetric.
+    """
+    layout = standard_layout(goal_board.height)
+    if goal_is_symmetric(goal_board, layout):
+        return lambda board: canonical_key(encode_grid(board.grid), layout)
+    return lambda board: encode_grid(board.grid)
+
+
+def astar_packed(board, goal_board, heuristic=None, stats=None, frontier="heap", weight=1):
+    """
+    returns the keys of a path from <board> to <goal_board>, or None if there is
+    none, using a* search over packed keys,
+    guided by <heuristic> (a GoalHeuristic for <goal_board> by default), with the
+    open list named by <frontier> as in astar_search. A <weight> above 1 makes it
+    weighted a*, ordered by g + weight * h; the bucket open list rounds the
+    weighted estimate down to index its buckets.
+    """
+    layout = puzzle_layout(board, goal_board)
+    start = encode_grid(board.grid, layout)
+    goal = encode_grid(goal_board.grid, layout)
+    if heuristic is None:
+        heuristic = GoalHeuristic(goal_board, layout)
+    if stats is None:
+        stats = SearchStats()
+    estimate = stats.timer('heuristic_time', heuristic.key_value)
+    if weight != 1:
+        unweighted = estimate
+        if frontier == "bucket":
+            def estimate(key):
+                # An infinite estimate stays infinite, and the bucket drops it.
+                h = weight * unweighted(key)
+                return h if h == float('inf') else int(h)
+        else:
+            estimate = lambda key: weight * unweighted(key)
+    successors_of = stats.timer('successor_time', key_successors)
+    symmetric = goal_is_symmetric(goal_board, layout)
+
+    # The open list holds (g, key, parent key) entries; a key's parent is fixed
+    # the first time it is extracted. parents is keyed by the canonical key, and
+    # the stored parent is always the key that was actually expanded. best_g
+    # holds the lowest g each canonical key was pushed with, so a key is never
+    # pushed again unless it is reached more cheaply.
+    if frontier == "bucket":
+        # buckets[f][g] is a stack of entries, as in BucketQueue, which also
+        # drops the dead ends with an infinite f.
+        buckets = []
+        bounds = [0, 0]  # the lowest f that may be non-empty, and the entry count
+
+        def push(f, entry):
+            if f == float('inf'):
+                return
+            while len(buckets) <= f:
+                buckets.append([])
+            row = buckets[f]
+            while len(row) <= entry[0]:
+                row.append([])
+            row[entry[0]].append(entry)
+            if f < bounds[0] or bounds[1] == 0:
+                bounds[0] = f
+            bounds[1] += 1
+
+        def pop():
+            row = buckets[bounds[0]]
+            while True:
+                while row and not row[-1]:
+                    row.pop()
+                if row:
+                    break
+                bounds[0] += 1
+                row = buckets[bounds[0]]
+            bounds[1] -= 1
+            return row[-1].pop()
+
+        def size():
+            return bounds[1]
+    else:
+        heap = []
+        counter = [0]
+
+        def push(f, entry):
+            heapq.heappush(heap, (f, counter[0], entry))
+            counter[0] += 1
+
+        def pop():
+            return heapq.heappop(heap)[2]
+
+        def size():
+            return len(heap)
+
+    push(estimate(start), (0, start, None))
+    parents = {}
+    best_g = {canonical_key(start, layout) if symmetric else start: 0}
+
+    while size():
+        g, key, parent = pop()
+        canon = canonical_key(key, layout) if symmetric else key
+        if canon in parents:
+            continue
+        parents[canon] = parent
+        if key == goal:
+            stats.solution_length = g
+            path = []
+            while key is not None:
+                path.append(key)
+                key = parents[canonical_key(key, layout) if symmetric else key]
+            path.reverse()
+            return path
+        successors = successors_of(key, layout)
+        stats.expanded += 1
+        stats.generated += len(successors)
+        for successor in successors:
+            canon = canonical_key(successor, layout) if symmetric else successor
+            best = best_g.get(canon)
+            if best is not None and best <= g + 1:
+                stats.duplicates += 1
+                continue
+            best_g[canon] = g + 1
+            push(g + 1 + estimate(successor), (g + 1, successor, key))
+        stats.update(size())
+
+    return None
+
+
+def dfs_packed(board, goal_board, stats=None, closed=None) -> str:
+    """
+    returns path from <board> to <goal_board> using depth-first-search (DFS) over
+    packed keys
+    """
+    out = io.StringIO()
+    if write_dfs_packed(board, goal_board, out, stats, closed):
+        return out.getvalue()
+    return "No solution"
+
+
+def write_dfs_packed(board, goal_board, out, stats=None, closed=None) -> bool:
+    """
+    Run depth-first-search (DFS) over packed keys from <board> to <goal_board>,
+    writing every board to <out> as it is popped. Returns True if <goal_board> was
+    reached.
+
+    <closed> holds the keys already expanded: an empty set by default, or a
+    DiskClosedSet to keep them out of memory.
+    """
+    layout = puzzle_layout(board, goal_board)
+    if stats is None:
+        stats = SearchStats()
+    successors_of = stats.timer('successor_time', key_successors)
+    goal = encode_grid(goal_board.grid, layout)
+    symmetric = goal_is_symmetric(goal_board, layout)
+    # Keys and depths are pushed in pairs.
+    frontier = [encode_grid(board.grid, layout), 0]
+    visited = set() if closed is None else closed
+    while frontier:
+        depth = frontier.pop()
+        key = frontier.pop()
+        write_grids((decode_key(key, layout),), out)
+        canon = canonical_key(key, layout) if symmetric else key
+        if canon in visited:
+            continue
+        visited.add(canon)
+        if key == goal:
+            stats.solution_length = depth
+            return True
+        successors = successors_of(key, layout)
+        stats.expanded += 1
+        stats.generated += len(successors)
+        depth += 1
+        for successor in successors:
+            frontier.append(successor)
+            frontier.append(depth)
+        stats.update(len(frontier) // 2)
+
+    return False
+
+
+# ====================================================================================
+# On-disk tables.
+#
+# PackedTable files map packed keys to small non-negative ints. They are written
+# once and then read through mmap, so a table costs no Python objects per entry
+# and the operating system shares its pages between processes that load it.
+#
+# Layout: a header, then an open-addressing array of little-endian keys (0 marks an
+# empty slot; no board packs to 0), then the values in the same slot order.
+
+TABLE_MAGIC = b'HRDT'
+TABLE_HEADER = struct.Struct('<4sHHQQ')  # magic, key bytes, value bytes, slots, entries
+HASH_MULTIPLIER = 0x9E3779B97F4A7C15
+HASH_MASK = (1 << 64) - 1
+
+
+def table_slot(key, slot_bits) -> int:
+    """
+    returns the home slot of <key> in a table of 2 ** <slot_bits> slots
+    """
+    return (((key ^ (key >> 32)) * HASH_MULTIPLIER) & HASH_MASK) >> (64 - slot_bits)
+
+
+class PackedTable:
+    """
+    A read-only hash table from packed keys to small ints, backed by a file mapped
+    into memory.
+    """
+
+    def __init__(self, filename):
+        """
+        :param filename: A table written by PackedTable.write.
+        :type filename: str
+        """
+        self.filename = filename
+        with open(filename, "rb") as table_file:
+            self.data = mmap.mmap(table_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.key_bytes, self.value_bytes, self.slots, self.entries = \
+            TABLE_HEADER.unpack_from(self.data, 0)
+        if magic != TABLE_MAGIC:
+            raise ValueError("{} is not a packed table".format(filename))
+        self.slot_bits = self.slots.bit_length() - 1
+        self.keys_offset = TABLE_HEADER.size
+        self.values_offset = self.keys_offset + self.slots * self.key_bytes
+
+    @staticmethod
+    def write(filename, items):
+        """
+        Write the mapping <items> from packed keys to non-negative ints to <filename>.
+
+        :param filename: The file to create.
+        :type filename: str
+        :param items: The entries of the table.
+        :type items: Dict[int, int]
+        """
+        key_bytes = max(1, (max(items, default=1).bit_length() + 7) // 8)
+        value_bytes = max(1, (max(items.values(), default=0).bit_length() + 7) // 8)
+        slot_bits = max(4, (2 * len(items)).bit_length())
+        slots = 1 << slot_bits
+        keys = bytearray(slots * key_bytes)
+        values = bytearray(slots * value_bytes)
+        for key, value in items.items():
+            if key == 0:
+                raise ValueError("0 is reserved for empty slots")
+            slot = table_slot(key, slot_bits)
+            while keys[slot * key_bytes:(slot + 1) * key_bytes].count(0) != key_bytes:
+                slot = (slot + 1) & (slots - 1)
+            keys[slot * key_bytes:(slot + 1) * key_bytes] = key.to_bytes(key_bytes, 'little')
+            values[slot * value_bytes:(slot + 1) * value_bytes] = value.to_bytes(value_bytes, 'little')
+        with open(filename, "wb") as table_file:
+            table_file.write(TABLE_HEADER.pack(TABLE_MAGIC, key_bytes, value_bytes, slots, len(items)))
+            table_file.write(keys)
+            table_file.write(values)
+
+    def get(self, key, default=None):
+        """
+        returns the value stored for <key>, or <default> if it is not in the table
+        """
+        data = self.data
+        key_bytes = self.key_bytes
+        if key.bit_length() > 8 * key_bytes:
+            return default
+        wanted = key.to_bytes(key_bytes, 'little')
+        empty = bytes(key_bytes)
+        slot = table_slot(key, self.slot_bits)
+        mask = self.slots - 1
+        while True:
+            offset = self.keys_offset + slot * key_bytes
+            stored = data[offset:offset + key_bytes]
+            if stored == wanted:
+                offset = self.values_offset + slot * self.value_bytes
+                return int.from_bytes(data[offset:offset + self.value_bytes], 'little')
+            if stored == empty:
+                return default
+            slot = (slot + 1) & mask
+
+    def __len__(self):
+        return self.entries
+
+    def close(self):
+        self.data.close()
+
+
+class DiskClosedSet:
+    """
+    A set of packed keys kept in an open-addressing hash table in a memory-mapped
+    temporary file, for closed lists too large for memory. Only the pages being
+    probed need to be resident, and the table doubles when it is half full.
+
+    It supports the in and add of a set, so a search can take either.
+    """
+
+    def __init__(self, layout, directory=None, slot_bits=16):
+        """
+        :param layout: The Layout of the boards whose keys are stored.
+        :type layout: Layout
+        :param directory: Where the temporary file is made (the system default if
+            None). It is deleted by close.
+        :type directory: Optional[str]
+        :param slot_bits: The initial table has 2 ** <slot_bits> slots.
+        :type slot_bits: int
+        """
+        self.key_bytes = (layout.width * layout.height * layout.cell_bits + 7) // 8
+        self.empty = bytes(self.key_bytes)
+        self.directory = directory
+        self.entries = 0
+        self.filename = None
+        self.data = None
+        self.open_table(slot_bits)
+
+    def open_table(self, slot_bits):
+        """
+        Replace the table with an empty one of 2 ** <slot_bits> slots.
+        """
+        descriptor, filename = tempfile.mkstemp(suffix=".closed", dir=self.directory)
+        try:
+            os.ftruncate(descriptor, (1 << slot_bits) * self.key_bytes)
+            data = mmap.mmap(descriptor, 0)
+        finally:
+            os.close(descriptor)
+        self.close()
+        self.filename = filename
+        self.data = data
+        self.slot_bits = slot_bits
+        self.mask = (1 << slot_bits) - 1
+        self.entries = 0
+
+    def find(self, key) -> tuple:
+        """
+        returns (offset, found): the byte offset of <key> in the table if found is
+        True, or else of the empty slot where it belongs
+        """
+        key_bytes = self.key_bytes
+        data = self.data
+        wanted = key.to_bytes(key_bytes, 'little')
+        slot = table_slot(key, self.slot_bits)
+        while True:
+            offset = slot * key_bytes
+            stored = data[offset:offset + key_bytes]
+            if stored == wanted:
+                return offset, True
+            if stored == self.empty:
+                return offset, False
+            slot = (slot + 1) & self.mask
+
+    def __contains__(self, key):
+        return self.find(key)[1]
+
+    def add(self, key):
+        offset, found = self.find(key)
+        if found:
+            return
+        if key == 0:
+            raise ValueError("0 is reserved for empty slots")
+        self.data[offset:offset + self.key_bytes] = key.to_bytes(self.key_bytes, 'little')
+        self.entries += 1
+        if 2 * self.entries > self.mask + 1:
+            self.grow()
+
+    def grow(self):
+        """
+        Move every key into a table twice the size.
+        """
+        old = self.data
+        old_filename = self.filename
+        key_bytes = self.key_bytes
+        self.data = None
+        self.filename = None
+        self.open_table(self.slot_bits + 1)
+        for offset in range(0, len(old), key_bytes):
+            stored = old[offset:offset + key_bytes]
+            if stored != self.empty:
+                self.add(int.from_bytes(stored, 'little'))
+        old.close()
+        os.remove(old_filename)
+
+    def __len__(self):
+        return self.entries
+
+    def close(self):
+        if self.data is not None:
+            self.data.close()
+            os.remove(self.filename)
+            self.data = None
+            self.filename = None
+
+
+# ====================================================================================
+# Pattern databases.
+#
+# A pattern is a set of piece classes. Projecting a key onto a pattern blanks every
+# square covered by other pieces, and a backward BFS from the projected goal gives
+# the exact number of pattern-piece moves needed from every abstract position. Each
+# move slides exactly one piece, so with the classes split into disjoint patterns
+# the distances can be added together and the sum is still admissible.
+
+# All the 1x2 pieces together with the 2x2 piece, and the single pieces on their own.
+# Patterns name piece classes by the symbol on the first square of the shape, and
+# classes a board does not use are left out of its patterns.
+PDB_PATTERNS = (('1', '<', '^'), (char_single,))
+
+
+def parse_patterns(text) -> tuple:
+    """
+    returns the patterns described by <text>, groups of piece symbols separated by
+    commas (the default PDB_PATTERNS is "1<^,2")
+    """
+    patterns = []
+    for group in text.split(","):
+        symbols = set(group.strip())
+        pattern = tuple(symbol for symbol in ANCHOR_SYMBOLS if symbol in symbols)
+        if not pattern or len(pattern) != len(symbols):
+            raise ValueError("bad pattern {!r}: use the symbols {}".format(group, ", ".join(ANCHOR_SYMBOLS)))
+        patterns.append(pattern)
+    covered = [symbol for pattern in patterns for symbol in pattern]
+    if len(covered) != len(set(covered)):
+        raise ValueError("patterns must not share piece classes")
+    return tuple(patterns)
+
+
+def pattern_rows(pattern, layout) -> RowTable:
+    """
+    returns a table mapping every packed row of <layout> to the same row with the
+    squares of pieces outside <pattern> blanked
+    """
+    pieces = layout.pieces
+    kept = {code for symbol in pattern if symbol in pieces.anchor_codes
+            for code in pieces.shape_codes[pieces.anchor_codes[symbol]]}
+    bits = layout.cell_bits
+    mask = layout.cell_mask
+
+    def project(row):
+        projected = 0
+        for x in range(layout.width):
+            code = (row >> (bits * x)) & mask
+            if code in kept:
+                projected |= code << (bits * x)
+        return projected
+
+    return RowTable(project)
+
+
+def project_key(key, layout, rows) -> int:
+    """
+    returns <key> projected through the pattern_rows table <rows>
+    """
+    row_bits = layout.row_bits
+    row_mask = layout.row_mask
+    projected = 0
+    shift = 0
+    for _ in range(layout.height):
+        projected |= rows[(key >> shift) & row_mask] << shift
+        shift += row_bits
+    return projected
+
+
+def goal_distances(goal, layout) -> dict:
+    """
+    returns the distance to the packed board <goal> of every key it can be reached
+    from, found by breadth-first search
+    """
+    # Moves are reversible, so searching forward from the goal gives the distances
+    # to the goal.
+    distances = {goal: 0}
+    queue = [goal]
+    for key in queue:
+        distance = distances[key] + 1
+        for successor in key_successors(key, layout):
+            if successor not in distances:
+                distances[successor] = distance
+                queue.append(successor)
+    return distances
+
+
+def build_pattern_database(goal_board, pattern, layout) -> dict:
+    """
+    returns the distance to the goal of every abstract position of <pattern> from
+    which the projected <goal_board> can be reached
+    """
+    goal = encode_grid(goal_board.grid, layout)
+    return goal_distances(project_key(goal, layout, pattern_rows(pattern, layout)), layout)
+
+
+def pattern_database_file(directory, goal_board, pattern, layout) -> str:
+    """
+    returns the path of the table for <pattern> and <goal_board> in <directory>
+    """
+    goal = encode_grid(goal_board.grid, layout)
+    name = "pdb_{}x{}{}_{:x}_{}.tbl".format(layout.width, layout.height, layout.tag, goal, "".join(pattern))
+    return os.path.join(directory, name.replace('<', 'h').replace('^', 'v'))
+
+
+def build_pattern_databases(goal_board, directory, patterns=PDB_PATTERNS, layout=None) -> list:
+    """
+    Write the table of every pattern in <patterns> for <goal_board>, packed with
+    <layout> (the one of <goal_board> by default), to <directory>, skipping tables
+    that already exist, and return their paths.
+    """
+    if layout is None:
+        layout = puzzle_layout(goal_board)
+    os.makedirs(directory, exist_ok=True)
+    filenames = []
+    for pattern in patterns:
+        filename = pattern_database_file(directory, goal_board, pattern, layout)
+        if not os.path.exists(filename):
+            # Write to a temporary name first so that an interrupted build is never
+            # loaded, and so that processes building the same table do not collide.
+            temporary = "{}.{}.tmp".format(filename, os.getpid())
+            PackedTable.write(temporary, build_pattern_database(goal_board, pattern, layout))
+            os.replace(temporary, filename)
+        filenames.append(filename)
+    return filenames
+
+
+class PatternDatabaseHeuristic:
+    """
+    The sum of the disjoint pattern database distances of a board, an admissible and
+    consistent estimate of its distance to the goal.
+    """
+
+    def __init__(self, goal_board, directory, patterns=PDB_PATTERNS, layout=None):
+        """
+        :param goal_board: The goal board.
+        :type goal_board: Board
+        :param directory: Where the tables are stored. Missing tables are built.
+        :type directory: str
+        :param patterns: Disjoint groups of piece symbols.
+        :type patterns: Tuple[Tuple[str, ...], ...]
+        :param layout: The Layout boards are packed with (the one of <goal_board>
+            by default).
+        :type layout: Optional[Layout]
+        """
+        if layout is None:
+            layout = puzzle_layout(goal_board)
+        self.layout = layout
+        filenames = build_pattern_databases(goal_board, directory, patterns, layout)
+        self.tables = [(pattern_rows(pattern, layout), PackedTable(filename))
+                       for pattern, filename in zip(patterns, filenames)]
+        # Projections that the goal cannot be reached from are not in the tables.
+        self.unreachable = float('inf')
+
+    def key_value(self, key) -> int:
+        """
+        returns the estimate for the board packed in <key>
+        """
+        layout = self.layout
+        total = 0
+        for rows, table in self.tables:
+            distance = table.get(project_key(key, layout, rows))
+            if distance is None:
+                return self.unreachable
+            total += distance
+        return total
+
+    def __call__(self, board) -> int:
+        """
+        returns the estimate for <board>
+        """
+        return self.key_value(encode_grid(board.grid, self.layout))
+
+    def close(self):
+        for _, table in self.tables:
+            table.close()
+
+
+# ====================================================================================
+# Distance tables.
+#
+# A breadth-first search from the goal enumerates every board the goal can be
+# reached from, which for a solvable puzzle is the whole state space reachable from
+# its start, together with its exact distance to the goal. Stored in a PackedTable,
+# the number of moves left from any of those boards, and a move that starts a
+# shortest solution, each take a single lookup.
+
+
+def distance_table_file(directory, goal_board, layout) -> str:
+    """
+    returns the path of the distance table for <goal_board> in <directory>
+    """
+    goal = encode_grid(goal_board.grid, layout)
+    return os.path.join(directory, "dist_{}x{}{}_{:x}.tbl".format(layout.width, layout.height, layout.tag, goal))
+
+
+def build_distance_table(goal_board, directory, layout=None) -> str:
+    """
+    Write the distance table for <goal_board>, packed with <layout> (the one of
+    <goal_board> by default), to <directory> unless it already exists, and return
+    its path.
+    """
+    if layout is None:
+        layout = puzzle_layout(goal_board)
+    os.makedirs(directory, exist_ok=True)
+    filename = distance_table_file(directory, goal_board, layout)
+    if not os.path.exists(filename):
+        temporary = "{}.{}.tmp".format(filename, os.getpid())
+        PackedTable.write(temporary, goal_distances(encode_grid(goal_board.grid, layout), layout))
+        os.replace(temporary, filename)
+    return filename
+
+
+class DistanceTable:
+    """
+    The exact number of moves from every board to the goal, read from a table
+    built by build_distance_table. As a heuristic it is perfect, so a* walks
+    straight down a shortest solution.
+    """
+
+    def __init__(self, goal_board, directory, layout=None):
+        """
+        :param goal_board: The goal board.
+        :type goal_board: Board
+        :param directory: Where the tables are stored. A missing table is built.
+        :type directory: str
+        :param layout: The Layout boards are packed with (the one of <goal_board>
+            by default).
+        :type layout: Optional[Layout]
+        """
+        if layout is None:
+            layout = puzzle_layout(goal_board)
+        self.layout = layout
+        self.table = PackedTable(build_distance_table(goal_board, directory, layout))
+
+    def key_distance(self, key):
+        """
+        returns the number of moves from the board packed in <key> to the goal, or
+        None if the goal cannot be reached from it
+        """
+        return self.table.get(key)
+
+    def distance(self, board):
+        """
+        returns the number of moves from <board> to the goal, or None if the goal
+        cannot be reached from it
+        """
+        return self.table.get(encode_grid(board.grid, self.layout))
+
+    def hint(self, board):
+        """
+        returns the board after the first move of a shortest solution from <board>,
+        or None if <board> is the goal or cannot reach it
+        """
+        key = encode_grid(board.grid, self.layout)
+        distance = self.table.get(key)
+        if not distance:
+            return None
+        for successor in key_successors(key, self.layout):
+            if self.table.get(successor) == distance - 1:
+                return key_to_board(successor, self.layout)
+        return None
+
+    def key_value(self, key):
+        """
+        returns the distance of the board packed in <key>, as a heuristic
+        """
+        distance = self.table.get(key)
+        return float('inf') if distance is None else distance
+
+    def __call__(self, board):
+        """
+        returns the distance of <board>, as a heuristic
+        """
+        return self.key_value(encode_grid(board.grid, self.layout))
+
+    def __len__(self):
+        return len(self.table)
+
+    def close(self):
+        self.table.close()
+
+
+# ====================================================================================
+# Memory-bounded search.
+#
+# These searches run over packed keys and take a budget in nodes; MEMORY_NODE_BYTES
+# converts the --max-memory budget from megabytes. With an admissible heuristic such
+# as the pattern databases IDA* and SMA* return optimal solutions.
+
+# Measured with tracemalloc on hard1.txt: an SMA* node with its key, its places in
+# both queues and its slot in the duplicate table.
+MEMORY_NODE_BYTES = 400
+
+
+def memory_budget(megabytes) -> int:
+    """
+    returns how many search nodes fit in <megabytes>
+    """
+    return max(1, int(megabytes * 1024 * 1024) // MEMORY_NODE_BYTES)
+
+
+def idastar(board, goal_board, heuristic=None, max_nodes=None, stats=None):
+    """
+    returns the keys of a path from <board> to <goal_board>, or None if there is
+    none, using iterative deepening a*.
+
+    Each iteration is a depth-first search bounded by f, so memory holds the current
+    path plus a transposition table of at most <max_nodes> keys, which stops the
+    search from re-entering a position it already reached more cheaply during the
+    same iteration.
+    """
+    layout = puzzle_layout(board, goal_board)
+    if heuristic is None:
+        heuristic = GoalHeuristic(goal_board, layout)
+    if stats is None:
+        stats = SearchStats()
+    start = encode_grid(board.grid, layout)
+    goal = encode_grid(goal_board.grid, layout)
+    estimate = stats.timer('heuristic_time', heuristic.key_value)
+    successors_of = stats.timer('successor_time', key_successors)
+    if start == goal:
+        stats.solution_length = 0
+        return [start]
+
+    bound = estimate(start)
+    while bound != float('inf'):
+        next_bound = float('inf')
+        table = {start: 0}
+        path = [start]
+        on_path = {start}
+        stack = [iter(successors_of(start, layout))]
+        stats.expanded += 1
+        while stack:
+            g = len(path)
+            for child in stack[-1]:
+                stats.generated += 1
+                if child in on_path:
+                    continue
+                f = g + estimate(child)
+                if f > bound:
+                    if f < next_bound:
+                        next_bound = f
+                    continue
+                if child == goal:
+                    path.append(child)
+                    stats.solution_length = g
+                    return path
+                seen = table.get(child)
+                if seen is not None and seen <= g:
+                    continue
+                if seen is not None or max_nodes is None or len(table) < max_nodes:
+                    table[child] = g
+                path.append(child)
+                on_path.add(child)
+                stack.append(iter(successors_of(child, layout)))
+                stats.expanded += 1
+                # The frontier of a depth-first iteration is the current path.
+                stats.update(len(path))
+                break
+            else:
+                stack.pop()
+                on_path.discard(path.pop())
+        bound = next_bound
+
+    return None
+
+
+class TableFullError(Exception):
+    """
+    Raised by dfs_pruned when its transposition table fills up in a search
+    without a depth limit.
+    """
+
+
+def dfs_pruned(board, goal_board, heuristic=None, max_nodes=None, depth_step=None, stats=None):
+    """
+    returns the keys of a path from <board> to <goal_board>, or None if there is
+    none, using a depth-first search that only pushes children worth visiting.
+
+    Children are tried in order of <heuristic> (a GoalHeuristic for <goal_board>
+    by default). A child is dropped before it is pushed if it is on the current
+    path, which includes the board just left, or if the transposition table has
+    seen it at the same or a smaller depth (at any depth without a depth limit).
+    The table holds at most <max_nodes> keys, so memory is bounded by the table
+    and the current path.
+
+    With <depth_step>, the search is iterative deepening: the depth limit starts
+    at <depth_step> and grows by it until a solution is found, so a step of 1
+    finds a shortest solution. Without it a single unbounded search is run, which
+    raises TableFullError if the table fills up: a board left out of it could be
+    searched again below every path that reaches it, and the search would take
+    time exponential in the depth.
+    """
+    layout = puzzle_layout(board, goal_board)
+    if heuristic is None:
+        heuristic = GoalHeuristic(goal_board, layout)
+    if stats is None:
+        stats = SearchStats()
+    start = encode_grid(board.grid, layout)
+    goal = encode_grid(goal_board.grid, layout)
+    estimate = stats.timer('heuristic_time', heuristic.key_value)
+    successors_of = stats.timer('successor_time', key_successors)
+    if start == goal:
+        stats.solution_length = 0
+        return [start]
+
+    def children(key, g):
+        # The children of <key> at depth <g> worth visiting, best first.
+        successors = successors_of(key, layout)
+        stats.expanded += 1
+        stats.generated += len(successors)
+        kept = []
+        for child in successors:
+            seen = table.get(child)
+            if child in on_path or (seen is not None and (seen <= g or not bounded)):
+                stats.duplicates += 1
+            else:
+                kept.append(child)
+        kept.sort(key=estimate)
+        return iter(kept)
+
+    # Without a depth limit, reaching a board again more cheaply does not change
+    # what can be found below it, so it is never searched twice.
+    bounded = bool(depth_step)
+    limit = depth_step if bounded else float('inf')
+    while True:
+        table = {start: 0}
+        path = [start]
+        on_path = {start}
+        stack = [children(start, 1)]
+        # Whether some board was not expanded because of the depth limit.
+        cut_off = False
+        while stack:
+            g = len(path)
+            for child in stack[-1]:
+                if child == goal:
+                    path.append(child)
+                    stats.solution_length = g
+                    return path
+                # A sibling's subtree may have reached the child more cheaply
+                # since it was pushed.
+                seen = table.get(child)
+                if child in on_path or (seen is not None and (seen <= g or not bounded)):
+                    continue
+                if seen is not None or max_nodes is None or len(table) < max_nodes:
+                    table[child] = g
+                elif not bounded:
+                    raise TableFullError("the transposition table is full after {} boards; give the "
+                                         "search more memory or a depth step".format(len(table)))
+                if g >= limit:
+                    cut_off = True
+                    continue
+                path.append(child)
+                on_path.add(child)
+                stack.append(children(child, g + 1))
+                stats.update(len(path))
+                break
+            else:
+                stack.pop()
+                on_path.discard(path.pop())
+        if not cut_off:
+            return None
+        limit += depth_step
+
+
+class MemoryNode:
+    """
+    A node of the SMA* search tree.
+    """
+
+    __slots__ = ('key', 'g', 'f', 'parent', 'children', 'forgotten', 'is_open', 'open_f')
+
+    def __init__(self, key, g, f, parent):
+        """
+        :param key: The packed board.
+        :type key: int
+        :param g: The number of moves from the start.
+        :type g: int
+        :param f: The backed-up f value of the node.
+        :type f: float
+        :param parent: The node this one was generated from.
+        :type parent: Optional[MemoryNode]
+        """
+        self.key = key
+        self.g = g
+        self.f = f
+        self.parent = parent
+        # The number of children in memory, and the lowest f of the children that
+        # are not: forgotten ones, and ones left out of the last expansion.
+        self.children = 0
+        self.forgotten = float('inf')
+        # Whether the node is on the open list, and the f it is queued with: its own
+        # f until it is expanded, and afterwards the lowest f of the children that
+        # are not in memory, which an expansion generates again.
+        self.is_open = True
+        self.open_f = f
+
+
+class MemoryQueue:
+    """
+    A set of SMA* nodes in buckets indexed by f and then by g. Unlike a heap with
+    lazy deletion, a node is taken out as soon as its f changes, so the queue never
+    holds more nodes than the tree.
+    """
+
+    def __init__(self):
+        # buckets[f][g] is a dict used as an ordered set of the nodes with that f
+        # and g. Empty buckets are deleted.
+        self.buckets = {}
+
+    def add(self, node, f):
+        self.buckets.setdefault(f, {}).setdefault(node.g, {})[node] = None
+
+    def remove(self, node, f):
+        row = self.buckets[f]
+        bucket = row[node.g]
+        del bucket[node]
+        if not bucket:
+            del row[node.g]
+            if not row:
+                del self.buckets[f]
+
+    def take(self, f, g):
+        """
+        returns the last node added with <f> and <g>, after removing it
+        """
+        node = next(reversed(self.buckets[f][g]))
+        self.remove(node, f)
+        return node
+
+    def lowest(self):
+        """
+        returns the node with the lowest f, deepest first, after removing it, or
+        None when every node has an infinite f
+        """
+        if not self.buckets:
+            return None
+        f = min(self.buckets)
+        if f == float('inf'):
+            return None
+        return self.take(f, max(self.buckets[f]))
+
+    def highest(self):
+        """
+        returns the node with the highest f, shallowest first, after removing it, or
+        None when the queue is empty
+        """
+        if not self.buckets:
+            return None
+        f = max(self.buckets)
+        return self.take(f, min(self.buckets[f]))
+
+
+def smastar(board, goal_board, heuristic=None, max_nodes=100000, stats=None):
+    """
+    returns the keys of a path from <board> to <goal_board>, or None if there is
+    none, using simplified memory-bounded a*.
+
+    At most <max_nodes> nodes are kept. An expansion only keeps the children whose
+    f is the node's own, and the node stays on the open list with the lowest f of
+    the others. When the tree is full the leaf with the highest f (the shallowest
+    on ties) is forgotten. Its parent remembers the f and goes back on the open
+    list with it, and expanding the parent again only generates the children that
+    are no longer in memory.
+    """
+    layout = puzzle_layout(board, goal_board)
+    if heuristic is None:
+        heuristic = GoalHeuristic(goal_board, layout)
+    if stats is None:
+        stats = SearchStats()
+    start = encode_grid(board.grid, layout)
+    goal = encode_grid(goal_board.grid, layout)
+    estimate = stats.timer('heuristic_time', heuristic.key_value)
+    successors_of = stats.timer('successor_time', key_successors)
+
+    root = MemoryNode(start, 0, estimate(start), None)
+    # best holds the open nodes by open_f and worst the leaves other than the root
+    # by f.
+    best = MemoryQueue()
+    best.add(root, root.open_f)
+    worst = MemoryQueue()
+    # The cheapest node in memory for each key, used to drop duplicate children.
+    nodes = {start: root}
+    size = 1
+
+    while True:
+        node = best.lowest()
+        if node is None:
+            return None
+        f = node.open_f
+        if node.key == goal:
+            stats.solution_length = node.g
+            path = []
+            while node is not None:
+                path.append(node.key)
+                node = node.parent
+            path.reverse()
+            return path
+
+        node.is_open = False
+        node.forgotten = float('inf')
+        if node.children == 0 and node is not root:
+            worst.remove(node, node.f)
+        g = node.g + 1
+        parent_key = node.parent.key if node.parent is not None else None
+        successors = successors_of(node.key, layout)
+        stats.expanded += 1
+        stats.generated += len(successors)
+        for key in successors:
+            if key == parent_key:
+                continue
+            # Children still in memory are skipped here too, so a node expanded
+            # again only generates the ones it forgot.
+            other = nodes.get(key)
+            if other is not None and other.g <= g:
+                continue
+            child_f = max(f, g + estimate(key))
+            if child_f > f:
+                # Only children on the node's own f are kept. The rest count as
+                # forgotten, so memory is not spent on them before the search
+                # reaches their f.
+                node.forgotten = min(node.forgotten, child_f)
+                continue
+            child = MemoryNode(key, g, child_f, node)
+            nodes[key] = child
+            node.children += 1
+            size += 1
+            best.add(child, child_f)
+            worst.add(child, child_f)
+        stats.update(size)
+        if node.forgotten < float('inf'):
+            node.is_open = True
+            node.open_f = node.forgotten
+            best.add(node, node.open_f)
+        if node.children == 0 and node is not root:
+            # Nothing below the node is in memory, so it is a leaf bounded by the
+            # children it left out. A dead end, or a node whose children are all in
+            # memory under cheaper copies that carry their own bounds, has nothing
+            # left to search.
+            node.f = node.forgotten
+            worst.add(node, node.f)
+
+        while size > max_nodes:
+            leaf = worst.highest()
+            if leaf is None:
+                return None
+            if leaf.is_open:
+                best.remove(leaf, leaf.open_f)
+            if nodes.get(leaf.key) is leaf:
+                del nodes[leaf.key]
+            size -= 1
+            parent = leaf.parent
+            parent.children -= 1
+            parent.forgotten = min(parent.forgotten, leaf.f)
+            # The parent goes back on the open list as soon as a child is forgotten,
+            # so a forgotten branch with a lower f than its siblings is searched
+            # again before them.
+            if not parent.is_open:
+                parent.is_open = True
+                parent.open_f = parent.forgotten
+                best.add(parent, parent.open_f)
+            elif parent.forgotten < parent.open_f:
+                best.remove(parent, parent.open_f)
+                parent.open_f = parent.forgotten
+                best.add(parent, parent.open_f)
+            if parent.children == 0 and parent is not root:
+                # Every child is forgotten: the parent is a leaf again, and the
+                # best of its children bounds it from below.
+                parent.f = parent.forgotten
+                worst.add(parent, parent.f)
+
+
+# ====================================================================================
+# Bidirectional search.
+#
+# Moves are reversible and the goal board is fully specified, so the goal can be
+# searched backwards with the same successor function. Both directions key their
+# parents by packed board, and a board reached from both sides joins the two
+# halves of a path.
+
+
+def join_paths(meet, forward_parents, backward_parents) -> list:
+    """
+    returns the keys of the path through <meet>, following <forward_parents> back
+    to the start and <backward_parents> on to the goal
+    """
+    path = []
+    key = meet
+    while key is not None:
+        path.append(key)
+        key = forward_parents[key]
+    path.reverse()
+    key = backward_parents[meet]
+    while key is not None:
+        path.append(key)
+        key = backward_parents[key]
+    return path
+
+
+def bidirectional_bfs(board, goal_board, stats=None):
+    """
+    returns the keys of a shortest path from <board> to <goal_board>, or None if
+    there is none, using breadth-first search from both ends, always expanding a
+    whole layer of the smaller frontier
+    """
+    layout = puzzle_layout(board, goal_board)
+    if stats is None:
+        stats = SearchStats()
+    successors_of = stats.timer('successor_time', key_successors)
+    start = encode_grid(board.grid, layout)
+    goal = encode_grid(goal_board.grid, layout)
+    if start == goal:
+        stats.solution_length = 0
+        return [start]
+
+    forward = ({start: None}, {start: 0}, [start])
+    backward = ({goal: None}, {goal: 0}, [goal])
+    while forward[2] and backward[2]:
+        side, other = (forward, backward) if len(forward[2]) <= len(backward[2]) else (backward, forward)
+        parents, depths, layer = side
+        other_depths = other[1]
+        best = None
+        best_length = float('inf')
+        next_layer = []
+        for key in layer:
+            depth = depths[key] + 1
+            successors = successors_of(key, layout)
+            stats.expanded += 1
+            stats.generated += len(successors)
+            for successor in successors:
+                if successor in parents:
+                    continue
+                parents[successor] = key
+                depths[successor] = depth
+                next_layer.append(successor)
+                if successor in other_depths and depth + other_depths[successor] < best_length:
+                    best = successor
+                    best_length = depth + other_depths[successor]
+            stats.update(len(forward[2]) + len(backward[2]) + len(next_layer))
+        side[2][:] = next_layer
+        if best is not None:
+            stats.solution_length = best_length
+            return join_paths(best, forward[0], backward[0])
+
+    return None
+
+
+def bidirectional_astar(board, goal_board, heuristic=None, reverse_heuristic=None, stats=None):
+    """
+    returns the keys of a path from <board> to <goal_board>, or None if there is
+    none, using bidirectional a* search.
+
+    The forward search is guided by <heuristic> towards the goal and the backward
+    search by <reverse_heuristic> towards the start (GoalHeuristics by default). The
+    search stops once the best meeting cost found is no more than the larger of the
+    two lowest f values in the open lists, which keeps it optimal with admissible
+    heuristics.
+    """
+    layout = puzzle_layout(board, goal_board)
+    if heuristic is None:
+        heuristic = GoalHeuristic(goal_board, layout)
+    if reverse_heuristic is None:
+        reverse_heuristic = GoalHeuristic(board, layout)
+    if stats is None:
+        stats = SearchStats()
+    successors_of = stats.timer('successor_time', key_successors)
+    start = encode_grid(board.grid, layout)
+    goal = encode_grid(goal_board.grid, layout)
+
+    # (open list, g values, parents, closed set, estimate) for each direction.
+    estimate = stats.timer('heuristic_time', heuristic.key_value)
+    reverse_estimate = stats.timer('heuristic_time', reverse_heuristic.key_value)
+    forward = ([(estimate(start), 0, start)], {start: 0}, {start: None}, set(), estimate)
+    backward = ([(reverse_estimate(goal), 0, goal)], {goal: 0}, {goal: None}, set(), reverse_estimate)
+    best = start if start == goal else None
+    best_length = 0 if start == goal else float('inf')
+    count = 1
+
+    while forward[0] and backward[0]:
+        if best_length <= max(forward[0][0][0], backward[0][0][0]):
+            break
+        side, other = (forward, backward) if forward[0][0][0] <= backward[0][0][0] else (backward, forward)
+        frontier, g_values, parents, closed, estimate = side
+        other_g = other[1]
+        _, _, key = heapq.heappop(frontier)
+        if key in closed:
+            continue
+        closed.add(key)
+        g = g_values[key] + 1
+        successors = successors_of(key, layout)
+        stats.expanded += 1
+        stats.generated += len(successors)
+        for successor in successors:
+            if g < g_values.get(successor, float('inf')):
+                g_values[successor] = g
+                parents[successor] = key
+                heapq.heappush(frontier, (g + estimate(successor), count, successor))
+                count += 1
+                if successor in other_g and g + other_g[successor] < best_length:
+                    best = successor
+                    best_length = g + other_g[successor]
+        stats.update(len(forward[0]) + len(backward[0]))
+
+    if best is None:
+        return None
+    stats.solution_length = best_length
+    return join_paths(best, forward[2], backward[2])
+
+
+# ====================================================================================
+# Macro moves.
+#
+# A macro move slides one piece any distance through blank squares, turning
+# corners as it goes, and counts as a single successor. Its cost is either the
+# number of squares slid ("cell"), which gives the same optimal cost as single
+# square moves with fewer levels, or 1 ("move"), the usual way Hua Rong Dao
+# solutions are counted.
+
+MACRO_COSTS = ("cell", "move")
+
+
+def macro_successors(key, layout) -> list:
+    """
+    returns (successor, cells) for every board reachable from <key> by sliding
+    one piece any distance, where cells is the fewest single square slides it takes
+    """
+    deltas = layout.tables.deltas
+    width = layout.width
+    successors = []
+    for code, x, y in key_pieces(key, layout):
+        slides = deltas[code]
+        start = y * width + x
+        seen = {start}
+        layer = [(key, start)]
+        cells = 0
+        while layer:
+            cells += 1
+            next_layer = []
+            for current, index in layer:
+                for need, delta, moved in slides[index]:
+                    if moved not in seen and not current & need:
+                        seen.add(moved)
+                        next_layer.append((current + delta, moved))
+                        successors.append((current + delta, cells))
+            layer = next_layer
+    return successors
+
+
+class MisplacedPieces:
+    """
+    The number of goal pieces with no piece of the same shape in their place, an
+    admissible and consistent estimate of the macro moves left, since each macro
+    move places one piece.
+    """
+
+    def __init__(self, goal_board, layout=None):
+        """
+        :param goal_board: The goal board.
+        :type goal_board: Board
+        :param layout: The Layout boards are packed with (the one of <goal_board>
+            by default).
+        :type layout: Optional[Layout]
+        """
+        if layout is None:
+            layout = puzzle_layout(goal_board)
+        self.layout = layout
+        self.goal = key_pieces(encode_grid(goal_board.grid, layout), layout)
+
+    def key_value(self, key) -> int:
+        """
+        returns the estimate for the board packed in <key>
+        """
+        pieces = set(key_pieces(key, self.layout))
+        return sum(1 for piece in self.goal if piece not in pieces)
+
+    def __call__(self, board) -> int:
+        """
+        returns the estimate for <board>
+        """
+        return self.key_value(encode_grid(board.grid, self.layout))
+
+
+def astar_macro(board, goal_board, cost="cell", heuristic=None, stats=None):
+    """
+    returns the keys of a path from <board> to <goal_board>, or None if there is
+    none, using a* search over macro moves, with one board per macro move.
+
+    With <cost> "cell" the search is guided by <heuristic> (a GoalHeuristic for
+    <goal_board> by default); with "move" it is always guided by MisplacedPieces,
+    as distances in squares overestimate the number of moves.
+    """
+    layout = puzzle_layout(board, goal_board)
+    if cost == "move":
+        heuristic = MisplacedPieces(goal_board, layout)
+    elif heuristic is None:
+        heuristic = GoalHeuristic(goal_board, layout)
+    if stats is None:
+        stats = SearchStats()
+    estimate = stats.timer('heuristic_time', heuristic.key_value)
+    successors_of = stats.timer('successor_time', macro_successors)
+    start = encode_grid(board.grid, layout)
+    goal = encode_grid(goal_board.grid, layout)
+    per_cell = cost == "cell"
+
+    # Heap entries are (f, count, g, key, parent key), as in astar_packed.
+    frontier = [(estimate(start), 0, 0, start, None)]
+    count = 1
+    parents = {}
+    best_g = {start: 0}
+
+    while frontier:
+        _, _, g, key, parent = heapq.heappop(frontier)
+        if key in parents:
+            continue
+        parents[key] = parent
+        if key == goal:
+            stats.solution_length = g
+            path = []
+            while key is not None:
+                path.append(key)
+                key = parents[key]
+            path.reverse()
+            return path
+        successors = successors_of(key, layout)
+        stats.expanded += 1
+        stats.generated += len(successors)
+        for successor, cells in successors:
+            new_g = g + (cells if per_cell else 1)
+            best = best_g.get(successor)
+            if best is not None and best <= new_g:
+                stats.duplicates += 1
+                continue
+            best_g[successor] = new_g
+            heapq.heappush(frontier, (new_g + estimate(successor), count, new_g, successor, key))
+            count += 1
+        stats.update(len(frontier))
+
+    return None
+
+
+# ====================================================================================
+# Anytime search.
+#
+# Weighted a* (astar_packed with a weight) orders the open list by g + W * h and
+# usually finds a solution with fewer expansions; with an admissible heuristic it is at
+# most W times longer than a shortest one. ARA* (anytime repairing a*) runs
+# weighted a* with a falling weight and reuses the search done so far: a state
+# reached more cheaply after it was expanded waits in an inconsistent set and
+# rejoins the open list when the weight falls, instead of the search starting over.
+# Each better solution is handed on as soon as it is found, so a time budget
+# trades solution length for latency.
+
+
+def anytime_path(nodes, goal, start, layout, symmetric) -> list:
+    """
+    returns the keys from <start> to <goal> following the parents in the ARA*
+    <nodes>, keyed by canonical key when <symmetric>
+    """
+    path = []
+    key = goal
+    while key is not None:
+        path.append(key)
+        _, _, reached, parent = nodes[canonical_key(key, layout) if symmetric else key]
+        # The node may hold the mirror image of <key>, reached from the mirror
+        # image of the board before it.
+        if parent is not None and reached != key:
+            parent = mirror_key(parent, layout)
+        key = parent
+    path.reverse()
+    if path[0] != start:
+        # The goal is symmetric, so the mirror image of the path also ends there.
+        path = [mirror_key(key, layout) for key in path]
+    return path
+
+
+def arastar(board, goal_board, heuristic=None, weight=2.0, step=0.5, time_budget=None, emit=None,
+            stats=None):
+    """
+    returns the keys of the best path from <board> to <goal_board> found by ARA*
+    over packed keys, or None if there is none, guided by <heuristic> (a
+    GoalHeuristic for <goal_board> by default).
+
+    The first search uses <weight>, and each later one a weight lower by <step>,
+    until a search with weight 1 ends or <time_budget> seconds have passed; the
+    budget is only checked once a solution has been found. emit(path, moves, bound)
+    is called with the keys of every better solution, where bound is the factor by
+    which it may be longer than a shortest one if the heuristic is admissible.
+    """
+    layout = puzzle_layout(board, goal_board)
+    start = encode_grid(board.grid, layout)
+    goal = encode_grid(goal_board.grid, layout)
+    if heuristic is None:
+        heuristic = GoalHeuristic(goal_board, layout)
+    if stats is None:
+        stats = SearchStats()
+    estimate = stats.timer('heuristic_time', heuristic.key_value)
+    successors_of = stats.timer('successor_time', key_successors)
+    symmetric = goal_is_symmetric(goal_board, layout)
+    deadline = None if time_budget is None else time.perf_counter() + time_budget
+
+    start_canon = canonical_key(start, layout) if symmetric else start
+    goal_canon = canonical_key(goal, layout) if symmetric else goal
+    # [g, h, the key reached, the key it was reached from] for every canonical key
+    # reached. queued holds the f each key on the open list was last pushed with;
+    # heap entries (f, count, canonical key) whose f differs are stale.
+    nodes = {start_canon: [0, estimate(start), start, None]}
+    queued = {start_canon: weight * nodes[start_canon][1]}
+    heap = [(queued[start_canon], 0, start_canon)]
+    count = 1
+    closed = set()
+    inconsistent = set()
+    goal_g = 0 if goal_canon == start_canon else float('inf')
+    best = None
+    best_length = None
+
+    while True:
+        timed_out = False
+        while heap and heap[0][0] < goal_g:
+            f, _, canon = heapq.heappop(heap)
+            if queued.get(canon) != f:
+                continue
+            del queued[canon]
+            closed.add(canon)
+            g, _, key, _ = nodes[canon]
+            successors = successors_of(key, layout)
+            stats.expanded += 1
+            stats.generated += len(successors)
+            g += 1
+            for successor in successors:
+                canon = canonical_key(successor, layout) if symmetric else successor
+                node = nodes.get(canon)
+                if node is None:
+                    node = nodes[canon] = [g, estimate(successor), successor, key]
+                elif node[0] <= g:
+                    stats.duplicates += 1
+                    continue
+                else:
+                    node[0] = g
+                    node[2] = successor
+                    node[3] = key
+                if canon == goal_canon:
+                    goal_g = g
+                if canon in closed:
+                    inconsistent.add(canon)
+                else:
+                    f = g + weight * node[1]
+                    queued[canon] = f
+                    heapq.heappush(heap, (f, count, canon))
+                    count += 1
+            stats.update(len(queued))
+            # The clock is only read every 256 expansions.
+            if deadline is not None and goal_g < float('inf') and not stats.expanded & 255 \
+                    and time.perf_counter() > deadline:
+                timed_out = True
+                break
+
+        if goal_g == float('inf'):
+            stats.solution_length = best_length
+            return best
+        # States on the path may have been reached more cheaply since the goal was,
+        # so the path can be shorter than the g of the goal.
+        path = anytime_path(nodes, goal, start, layout, symmetric)
+        moves = len(path) - 1
+        if best_length is None or moves < best_length:
+            best_length = moves
+            best = path
+            if emit is not None:
+                # The lowest g + h of a state left to expand bounds a shortest solution.
+                lowest = min((nodes[canon][0] + nodes[canon][1] for canon in (*queued, *inconsistent)),
+                             default=moves)
+                emit(best, moves, min(weight, moves / lowest) if lowest > 0 else 1.0)
+        if timed_out or weight <= 1 or (deadline is not None and time.perf_counter() > deadline):
+            stats.solution_length = best_length
+            return best
+
+        weight = max(1.0, weight - step)
+        queued.update(dict.fromkeys(inconsistent))
+        inconsistent.clear()
+        closed.clear()
+        for canon in queued:
+            queued[canon] = nodes[canon][0] + weight * nodes[canon][1]
+        heap = [(f, index, canon) for index, (canon, f) in enumerate(queued.items())]
+        heapq.heapify(heap)
+        count = len(heap)
+
+
+# ====================================================================================
+# Puzzle files.
+#
+# A puzzle file holds a start board and a goal board separated by a blank line, or
+# any number of such pairs, each starting with a marker line: PUZZLE_MARKER and the
+# name of the puzzle. read_puzzles reads every line once and packs the boards as
+# it goes, looking each row up in a table of the rows already seen, so a corpus of
+# puzzles is loaded from one file with no Piece or Board objects made.
+
+PUZZLE_MARKER = '#'
+
+# The standard packing of every row read so far, see standard_row.
+_standard_rows = {}
+
+
+def standard_row(row):
+    """
+    returns (the packed row, the number of 2x2 squares in it) for a 4-wide <row> of
+    standard pieces, or None for any other row
+    """
+    value = _standard_rows.get(row)
+    if value is None and row not in _standard_rows:
+        codes = STANDARD_PIECES.codes
+        if len(row) == WIDTH and all(ch in codes for ch in row):
+            value = (encode_grid((row,)), row.count('1'))
+        _standard_rows[row] = value
+    return value
+
+
+class Puzzle:
+    """
+    A start and a goal board packed with the Layout of their pieces.
+    """
+
+    __slots__ = ('name', 'start', 'goal', 'layout')
+
+    def __init__(self, name, start, goal, layout):
+        """
+        :param name: The name on the marker line of the puzzle, or None if it had none.
+        :type name: Optional[str]
+        :param start: The packed start board.
+        :type start: int
+        :param goal: The packed goal board.
+        :type goal: int
+        :param layout: The Layout both boards are packed with.
+        :type layout: Layout
+        """
+        self.name = name
+        self.start = start
+        self.goal = goal
+        self.layout = layout
+
+    def boards(self) -> tuple:
+        """
+        returns the start and goal Boards of the puzzle
+        """
+        return key_to_board(self.start, self.layout), key_to_board(self.goal, self.layout)
+
+
+def pack_puzzle(name, boards) -> Puzzle:
+    """
+    returns the Puzzle <name> whose start and goal boards are the lists of rows
+    <boards>
+    """
+    if len(boards) != 2:
+        raise ValueError("puzzle {} has {} boards instead of a start and a goal".format(
+            name if name is not None else "", len(boards)))
+    start, goal = boards
+    if len(start) != len(goal) or len(start[0]) != len(goal[0]):
+        raise ValueError("the start and goal boards of puzzle {} differ in size".format(
+            name if name is not None else ""))
+
+    layout = standard_layout(len(start))
+    row_bits = layout.row_bits
+    keys = []
+    for rows in boards:
+        key = 0
+        blocks = 0
+        shift = 0
+        for row in rows:
+            packed = standard_row(row)
+            if packed is None:
+                break
+            key |= packed[0] << shift
+            blocks += packed[1]
+            shift += row_bits
+        else:
+            if blocks <= 4:
+                keys.append(key)
+    if len(keys) == 2:
+        return Puzzle(name, keys[0], keys[1], layout)
+
+    # Other widths and pieces, and several 2x2 pieces, need their Layout first.
+    board, goal_board = (Board(len(rows), (), [shared_row(row) for row in rows]) for rows in boards)
+    layout = puzzle_layout(board, goal_board)
+    return Puzzle(name, encode_grid(board.grid, layout), encode_grid(goal_board.grid, layout), layout)
+
+
+def read_puzzles(filename) -> list:
+    """
+    returns the Puzzles in <filename>, in the order they are written
+    """
+    puzzles = []
+    name = None
+    boards = [[]]
+    with open(filename) as puzzle_file:
+        for line in puzzle_file:
+            if line.startswith(PUZZLE_MARKER):
+                if boards[0] or name is not None:
+                    puzzles.append(pack_puzzle(name, [rows for rows in boards if rows]))
+                name = line[len(PUZZLE_MARKER):].strip()
+                boards = [[]]
+                continue
+            row = line.rstrip()
+            if row:
+                boards[-1].append(row)
+            elif boards[-1]:
+                boards.append([])
+    if boards[0] or name is not None:
+        puzzles.append(pack_puzzle(name, [rows for rows in boards if rows]))
+    return puzzles
+
+
+# ====================================================================================
+# Solution cache.
+#
+# Solutions are stored on disk, one file per puzzle and set of solver options, so a
+# puzzle solved before is answered by reading a file. A puzzle is named by its packed
+# start and goal keys, so the layout of the file it came from does not matter. A
+# puzzle and its left-right mirror image get entries of their own: the searches try
+# moves in a fixed order of directions, so the solution of a mirror image is not
+# the mirror image of the solution, and a hit must write what a search would.
+#
+# Entry layout: a header, the fingerprint the file name is a hash of (compared on
+# reading, so a hash collision is a miss), then the solution text compressed with
+# zlib. Reading an entry touches it, and writing one removes the least recently used
+# entries until the cache fits its size. Entries written by another
+# SOLUTION_CACHE_VERSION are removed when read.
+
+# Raise when a search changes the solutions it writes, to drop every stored one.
+SOLUTION_CACHE_VERSION = 2
+CACHE_MAGIC = b'HRDS'
+CACHE_HEADER = struct.Struct('<4sHqI')  # magic, version, solution length (-1 for none), fingerprint bytes
+CACHE_SUFFIX = ".sol"
+
+# The command line options that change the solution written for a puzzle.
+SOLVER_OPTIONS = ('algo', 'engine', 'moves', 'cost', 'heuristic', 'frontier', 'pdb_patterns', 'max_memory',
+                  'dfs', 'depth_step', 'bidir', 'weight', 'weight_step', 'time_budget')
+
+
+def solver_options(args) -> tuple:
+    """
+    returns the (name, value) pairs of the SOLVER_OPTIONS in <args>
+    """
+    return tuple((name, getattr(args, name, None)) for name in SOLVER_OPTIONS)
+
+
+def puzzle_fingerprint(puzzle, options) -> bytes:
+    """
+    returns the bytes naming <puzzle> solved with <options>
+    """
+    layout = puzzle.layout
+    pieces = layout.pieces
+    return repr((pieces.shapes, pieces.split, layout.width, layout.height, puzzle.start, puzzle.goal,
+                 options)).encode()
+
+
+class SolutionCache:
+    """
+    Solutions stored in a directory, each in a file named by a hash of its
+    fingerprint, evicted least recently used first.
+    """
+
+    def __init__(self, directory, max_bytes):
+        """
+        :param directory: Where the solutions are stored. It is made when the first
+            one is written.
+        :type directory: str
+        :param max_bytes: The size the entries are cut down to after every write.
+        :type max_bytes: int
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    def filename(self, fingerprint) -> str:
+        """
+        returns the path of the entry for <fingerprint>
+        """
+        return os.path.join(self.directory, hashlib.sha256(fingerprint).hexdigest()[:32] + CACHE_SUFFIX)
+
+    def get(self, fingerprint):
+        """
+        returns (solution text, solution length) stored for <fingerprint>, with a
+        length of None if there is no solution, or None if nothing is stored
+        """
+        filename = self.filename(fingerprint)
+        try:
+            with open(filename, "rb") as cache_file:
+                data = cache_file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            magic, version, length, size = CACHE_HEADER.unpack_from(data, 0)
+            if magic != CACHE_MAGIC or version != SOLUTION_CACHE_VERSION:
+                raise ValueError("{} was written by another version".format(filename))
+            if data[CACHE_HEADER.size:CACHE_HEADER.size + size] != fingerprint:
+                return None
+            text = zlib.decompress(data[CACHE_HEADER.size + size:]).decode()
+        except (struct.error, zlib.error, ValueError):
+            self.remove(filename)
+            return None
+        try:
+            os.utime(filename)
+        except OSError:
+            pass
+        return text, None if length < 0 else length
+
+    def put(self, fingerprint, source, solution_length):
+        """
+        Store the solution of <solution_length> moves (None if there is no
+        solution) for <fingerprint>, then evict entries until the cache fits. The
+        solution is read from the text file <source>, from where it stands to its
+        end, and compressed as it is read.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        filename = self.filename(fingerprint)
+        temporary = "{}.{}.tmp".format(filename, os.getpid())
+        with open(temporary, "wb") as cache_file:
+            cache_file.write(CACHE_HEADER.pack(CACHE_MAGIC, SOLUTION_CACHE_VERSION,
+                                               -1 if solution_length is None else solution_length,
+                                               len(fingerprint)))
+            cache_file.write(fingerprint)
+            compressor = zlib.compressobj()
+            for chunk in iter(lambda: source.read(OUTPUT_BUFFER), ""):
+                cache_file.write(compressor.compress(chunk.encode()))
+            cache_file.write(compressor.flush())
+        os.replace(temporary, filename)
+        self.evict()
+
+    def evict(self):
+        """
+        Remove the least recently used entries until the rest take at most
+        max_bytes.
+        """
+        entries = []
+        total = 0
+        with os.scandir(self.directory) as scan:
+            for entry in scan:
+                if not entry.name.endswith(CACHE_SUFFIX):
+                    continue
+                try:
+                    info = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((info.st_mtime_ns, info.st_size, entry.path))
+                total += info.st_size
+        entries.sort()
+        for _, size, filename in entries:
+            if total <= self.max_bytes:
+                break
+            self.remove(filename)
+            total -= size
+
+    @staticmethod
+    def remove(filename):
+        # Another process sharing the cache may have removed it first.
+        try:
+            os.remove(filename)
+        except FileNotFoundError:
+            pass
+
+
+# ====================================================================================
+# Command line.
+
+
+def solve(inputfile, outputfile, args, stats=None) -> bool:
+    """
+    Solve every puzzle in <inputfile> with the command line options <args> and
+    write the solutions to <outputfile>, each after the marker line of its puzzle
+    if it has one. The file is opened for reading too, so that solve_puzzle can
+    fill a cache from it.
+
+    :param stats: Filled in with the totals of the searches when given, as
+        SearchStats.add sums them.
+    :type stats: Optional[SearchStats]
+    :return: True if every puzzle was solved.
+    :rtype: bool
+    """
+    # read the puzzles from the file
+    puzzles = read_puzzles(inputfile)
+    if stats is None:
+        stats = SearchStats()
+    stats.start()
+    solved = True
+    with open(outputfile, "w+", buffering=OUTPUT_BUFFER) as f:
+        for puzzle in puzzles:
+            if puzzle.name is not None:
+                f.write("{} {}\n".format(PUZZLE_MARKER, puzzle.name))
+            # Each puzzle gets its own stats, so none of its fields carry over.
+            puzzle_stats = SearchStats(stats.timed, stats.progress)
+            solved = solve_puzzle(puzzle, f, args, puzzle_stats) and solved
+            stats.add(puzzle_stats)
+    return solved
+
+
+def solve_puzzle(puzzle, f, args, stats=None) -> bool:
+    """
+    Solve <puzzle> with the command line options <args> and write the solution to
+    the file <f>. With args.cache_dir, the solution is read back from <f> to store
+    it, so <f> must be open for reading too.
+
+    :param stats: Filled in by the search when given.
+    :type stats: Optional[SearchStats]
+    :return: True if a solution was found.
+    :rtype: bool
+    """
+    board, goal_board = puzzle.boards()
+    layout = puzzle.layout
+    board_engine = args.engine == "board" and args.moves == "single" and (
+        args.algo == "astar" or (args.algo == "dfs" and args.dfs == "trace"))
+    if board_engine and not layout.standard:
+        raise ValueError("the board engine only solves 4-wide boards of the standard pieces; "
+                         "use --engine packed")
+
+    if stats is None:
+        stats = SearchStats()
+    cache = None
+    if args.cache_dir is not None:
+        cache = SolutionCache(args.cache_dir, int(args.cache_size * 1024 * 1024))
+        fingerprint = puzzle_fingerprint(puzzle, solver_options(args))
+        cached = cache.get(fingerprint)
+        if cached is not None:
+            stats.start()
+            text, stats.solution_length = cached
+            f.write(text)
+            stats.cached = True
+            stats.finish()
+            return stats.solution_length is not None
+
+    heuristic = None
+    reverse_heuristic = None
+    if args.heuristic == "pdb":
+        heuristic = PatternDatabaseHeuristic(goal_board, args.pdb_dir, args.pdb_patterns, layout)
+        if args.algo == "bidir":
+            reverse_heuristic = PatternDatabaseHeuristic(board, args.pdb_dir, args.pdb_patterns, layout)
+    elif args.heuristic == "table":
+        heuristic = DistanceTable(goal_board, args.table_dir, layout)
+        if args.algo == "bidir":
+            reverse_heuristic = DistanceTable(board, args.table_dir, layout)
+    # The distance table holds every board the goal can be reached from, so a
+    # start missing from it has no solution and nothing needs to be searched.
+    unsolvable = args.heuristic == "table" and heuristic.distance(board) is None
+
+    frontier = args.frontier
+    if frontier is None:
+        # Deep tie-breaking only keeps solutions optimal with a consistent heuristic.
+        frontier = "heap" if args.heuristic == "manhattan" else "bucket"
+
+    # Where the solution starts, to go back to if there is none.
+    begin = f.tell()
+
+    stats.start()
+    path = None
+    if unsolvable:
+        pass
+    elif args.moves == "macro":
+        path = astar_macro(board, goal_board, args.cost, heuristic, stats)
+    elif args.algo == "bidir":
+        if args.bidir == "bfs":
+            path = bidirectional_bfs(board, goal_board, stats)
+        else:
+            path = bidirectional_astar(board, goal_board, heuristic, reverse_heuristic, stats)
+    elif args.algo == "dfs" and args.dfs == "pruned":
+        path = dfs_pruned(board, goal_board, heuristic, memory_budget(args.max_memory), args.depth_step,
+                          stats)
+    elif args.algo == "idastar":
+        path = idastar(board, goal_board, heuristic, memory_budget(args.max_memory), stats)
+    elif args.algo == "smastar":
+        path = smastar(board, goal_board, heuristic, memory_budget(args.max_memory), stats)
+    elif args.engine == "packed" and args.algo == "astar":
+        path = astar_packed(board, goal_board, heuristic, stats, frontier)
+    elif args.algo == "wastar":
+        path = astar_packed(board, goal_board, heuristic, stats, frontier, args.weight)
+    elif args.algo == "arastar":
+        def emit(better, moves, bound):
+            # The output always holds the best solution so far.
+            f.seek(begin)
+            f.truncate()
+            write_grids((decode_key(key, layout) for key in better), f)
+            f.flush()
+            if stats.progress is not None:
+                print("[{:.1f}s] solution of {} moves, within {:.2f} of optimal".format(
+                    stats.elapsed, moves, bound), file=sys.stderr)
+
+        path = arastar(board, goal_board, heuristic, args.weight, args.weight_step, args.time_budget, emit,
+                       stats)
+
+    if unsolvable:
+        found = False
+    elif args.algo == "dfs" and args.dfs == "trace":
+        # DFS writes every board it pops, so the boards go straight to the file.
+        if args.engine == "packed":
+            closed = None
+            if args.closed == "disk":
+                closed = DiskClosedSet(layout, args.closed_dir)
+            try:
+                found = write_dfs_packed(board, goal_board, f, stats, closed)
+            finally:
+                if closed is not None:
+                    closed.close()
+        else:
+            found = write_dfs(board, goal_board, f, stats=stats)
+        f.write("\n\n")
+    elif args.algo == "astar" and args.engine == "board" and args.moves == "single":
+        goal_state = astar_search(board, goal_board, heuristic, stats, frontier)
+        found = goal_state is not None
+        if found:
+            write_grids(state_path(goal_state), f)
+    else:
+        found = path is not None
+        # ARA* has written its best solution already.
+        if found and args.algo != "arastar":
+            write_grids((decode_key(key, layout) for key in path), f)
+    if not found:
+        f.seek(begin)
+        f.truncate()
+        f.write("No solution\n\n")
+    if cache is not None:
+        f.seek(begin)
+        cache.put(fingerprint, f, stats.solution_length if found else None)
+    stats.finish()
+    return found
+
+
+# Reference solutions are stored next to the puzzles under names matching this.
+SOLUTION_FILES = "*_sol*.txt"
+
+
+def batch_inputs(pattern) -> list:
+    """
+    returns the puzzle files named by <pattern>, a glob or a directory, leaving
+    out the reference solutions named by SOLUTION_FILES. In a directory, only .txt
+    files holding exactly two boards, or starting with a puzzle marker, are
+    taken, which skips other solution files stored next to the puzzles.
+    """
+    if not os.path.isdir(pattern):
+        return [filename for filename in sorted(glob.glob(pattern))
+                if not fnmatch.fnmatch(os.path.basename(filename), SOLUTION_FILES)]
+    filenames = []
+    for filename in sorted(glob.glob(os.path.join(pattern, "*.txt"))):
+        if fnmatch.fnmatch(os.path.basename(filename), SOLUTION_FILES):
+            continue
+        with open(filename) as puzzle_file:
+            text = puzzle_file.read()
+        boards = [block for block in text.split("\n\n") if block.strip()]
+        if len(boards) == 2 or text.startswith(PUZZLE_MARKER):
+            filenames.append(filename)
+    return filenames
+
+
+def solve_batch_task(task) -> tuple:
+    """
+    Solve one puzzle of a batch, where <task> is (label, Puzzle, output file,
+    options). Returns (label, seconds, SearchStats, error message or None).
+    """
+    label, puzzle, outputfile, args = task
+    stats = SearchStats(args.stats)
+    started = time.perf_counter()
+    try:
+        with open(outputfile, "w+", buffering=OUTPUT_BUFFER) as f:
+            solve_puzzle(puzzle, f, args, stats)
+    except Exception as error:
+        return label, time.perf_counter() - started, stats, "{}: {}".format(type(error).__name__, error)
+    return label, time.perf_counter() - started, stats, None
+
+
+def run_batch(args):
+    """
+    Solve every puzzle named by args.batch on args.workers processes, writing the
+    solutions of each file with a .out extension next to it, or in
+    args.output_dir, and print a summary table. The puzzles of a file with
+    several are solved as separate tasks, and their solutions are joined in order
+    behind their marker lines. A file whose .out file already exists is reported
+    and not solved, so no earlier output is overwritten.
+    """
+    started = time.perf_counter()
+    tasks = []
+    # (output file, [(marker line, part file)]) for files with several puzzles.
+    joins = []
+    failed = []
+    if args.output_dir is not None:
+        os.makedirs(args.output_dir, exist_ok=True)
+    for filename in batch_inputs(args.batch):
+        stem = os.path.splitext(filename)[0]
+        label = os.path.basename(filename)
+        if args.output_dir is not None:
+            stem = os.path.join(args.output_dir, os.path.basename(stem))
+        if os.path.exists(stem + ".out"):
+            failed.append((label, 0.0, SearchStats(), "{} already exists; remove it or use another "
+                                                      "--output-dir".format(stem + ".out")))
+            continue
+        try:
+            puzzles = read_puzzles(filename)
+        except (OSError, ValueError) as error:
+            failed.append((label, 0.0, SearchStats(), "{}: {}".format(type(error).__name__, error)))
+            continue
+        if len(puzzles) == 1 and puzzles[0].name is None:
+            tasks.append((label, puzzles[0], stem + ".out", args))
+            continue
+        parts = []
+        for index, puzzle in enumerate(puzzles):
+            part = "{}.{}.part".format(stem, index)
+            tasks.append(("{} {}".format(label, puzzle.name), puzzle, part, args))
+            parts.append(("{} {}\n".format(PUZZLE_MARKER, puzzle.name), part))
+        joins.append((stem + ".out", parts))
+    if not tasks and not failed:
+        print("No puzzles match {}".format(args.batch))
+        return
+
+    workers = max(1, min(args.workers or 1, len(tasks)))
+    if workers == 1:
+        results = [solve_batch_task(task) for task in tasks]
+    else:
+        with multiprocessing.Pool(workers) as pool:
+            results = pool.map(solve_batch_task, tasks, chunksize=1)
+    results += failed
+
+    for outputfile, parts in joins:
+        with open(outputfile, "w", buffering=OUTPUT_BUFFER) as f:
+            for marker, part in parts:
+                f.write(marker)
+                if os.path.exists(part):
+                    with open(part) as part_file:
+                        shutil.copyfileobj(part_file, f, OUTPUT_BUFFER)
+                    os.remove(part)
+
+    width = max(len("puzzle"), max(len(result[0]) for result in results))
+    print("{:<{}}  {:>9}  {:>10}  {:>6}".format("puzzle", width, "time (s)", "expanded", "moves"))
+    for label, seconds, stats, error in results:
+        if error is not None:
+            moves = "error: " + error
+        elif stats.solution_length is None:
+            moves = "none"
+        else:
+            moves = stats.solution_length
+        print("{:<{}}  {:>9.3f}  {:>10}  {:>6}".format(label, width, seconds, stats.expanded, moves))
+    print("{} puzzles in {:.3f}s on {} workers".format(len(results), time.perf_counter() - started, workers))
+    if args.stats:
+        for label, seconds, stats, error in results:
+            print("\n{}\n{}".format(label, stats.summary()))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    """
+    returns the parser of the command line options
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--inputfile",
+        type=str,
+        help="The input file that contains the puzzles."
+    )
+    parser.add_argument(
+        "--outputfile",
+        type=str,
+        help="The output file that contains the solution."
+    )
+    parser.add_argument(
+        "--algo",
+        type=str,
+        required=True,
+        choices=['astar', 'dfs', 'idastar', 'smastar', 'bidir', 'wastar', 'arastar'],
+        help="The searching algorithm."
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        default="board",
+        choices=['board', 'packed'],
+        help="The state representation used by the search."
+    )
+    parser.add_argument(
+        "--moves",
+        type=str,
+        default="single",
+        choices=['single', 'macro'],
+        help="Slide a piece one square per move, or any distance (astar only)."
+    )
+    parser.add_argument(
+        "--cost",
+        type=str,
+        default="cell",
+        choices=list(MACRO_COSTS),
+        help="The cost of a macro move: the squares slid, or 1 per move."
+    )
+    parser.add_argument(
+        "--heuristic",
+        type=str,
+        default="manhattan",
+        choices=['manhattan', 'pdb', 'table'],
+        help="The heuristic used by astar; table looks up exact distances."
+    )
+    parser.add_argument(
+        "--frontier",
+        type=str,
+        choices=list(FRONTIERS),
+        help="The open list of astar: f buckets preferring deep states, or a heap. "
+             "Defaults to heap with --heuristic manhattan and bucket otherwise."
+    )
+    parser.add_argument(
+        "--pdb-dir",
+        type=str,
+        default="pdb",
+        help="Where pattern databases are stored; missing ones are built."
+    )
+    parser.add_argument(
+        "--pdb-patterns",
+        type=parse_patterns,
+        default=PDB_PATTERNS,
+        help="Disjoint groups of piece symbols, e.g. '1<^,2'."
+    )
+    parser.add_argument(
+        "--table-dir",
+        type=str,
+        default="tables",
+        help="Where distance tables are stored; missing ones are built."
+    )
+    parser.add_argument(
+        "--closed",
+        type=str,
+        default="memory",
+        choices=['memory', 'disk'],
+        help="Where the packed dfs keeps its closed list: a set, or a memory-mapped "
+             "hash table on disk."
+    )
+    parser.add_argument(
+        "--closed-dir",
+        type=str,
+        help="Where --closed disk makes its table (the system temporary directory "
+             "by default)."
+    )
+    parser.add_argument(
+        "--max-memory",
+        type=float,
+        default=256,
+        help="The memory budget in megabytes of idastar, smastar and --dfs pruned."
+    )
+    parser.add_argument(
+        "--dfs",
+        type=str,
+        default="trace",
+        choices=['trace', 'pruned'],
+        help="The dfs run by --algo dfs: the original search writing every board "
+             "it pops, or a pruned, heuristic-ordered search writing the path found."
+    )
+    parser.add_argument(
+        "--depth-step",
+        type=int,
+        help="Make --dfs pruned iterative deepening, raising the depth limit by "
+             "this much each time (1 finds a shortest solution)."
+    )
+    parser.add_argument(
+        "--bidir",
+        type=str,
+        default="bfs",
+        choices=['bfs', 'astar'],
+        help="The search run from both ends by --algo bidir."
+    )
+    parser.add_argument(
+        "--weight",
+        type=float,
+        default=2.0,
+        help="The heuristic weight of wastar, and the first weight of arastar; "
+             "solutions are at most this many times longer than optimal."
+    )
+    parser.add_argument(
+        "--weight-step",
+        type=float,
+        default=0.5,
+        help="How much arastar lowers its weight after each solution."
+    )
+    parser.add_argument(
+        "--time-budget",
+        type=float,
+        help="Stop arastar after this many seconds with the best solution so far "
+             "(it always waits for the first one)."
+    )
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Where solutions are cached, keyed by the puzzle and the solver options; "
+             "a cached puzzle is answered without searching. No cache by default."
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=float,
+        default=64,
+        help="The size in megabytes the solution cache is kept to, by removing the "
+             "least recently used solutions."
+    )
+    parser.add_argument(
+        "--stats",
+        action="store_true",
+        help="Print search statistics, including heuristic and successor timings, "
+             "to stderr (or after the table with --batch)."
+    )
+    parser.add_argument(
+        "--progress",
+        type=float,
+        help="Print a progress line to stderr about every PROGRESS seconds."
+    )
+    parser.add_argument(
+        "--batch",
+        type=str,
+        help="A directory or glob of puzzle files to solve, writing each solution "
+             "next to its puzzle with a .out extension. Existing .out files are "
+             "not overwritten."
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        help="Where --batch writes the .out files instead of next to the puzzles."
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="The number of processes used by --batch."
+    )
+    return parser
+
+
+if __name__ == "__main__":
+
+    parser = build_parser()
+    args = parser.parse_args()
+
+    if args.moves == "macro" and args.algo != "astar":
+        parser.error("--moves macro is only supported by --algo astar")
+    if args.closed == "disk" and (args.algo != "dfs" or args.dfs != "trace" or args.engine != "packed"):
+        parser.error("--closed disk is only supported by --algo dfs --dfs trace --engine packed")
+
+    if args.depth_step is not None and args.depth_step < 1:
+        parser.error("--depth-step must be at least 1")
+    if args.weight < 1:
+        parser.error("--weight must be at least 1")
+    if args.weight_step <= 0:
+        parser.error("--weight-step must be positive")
+
+    if args.batch is not None:
+        run_batch(args)
+    elif args.inputfile is None or args.outputfile is None:
+        parser.error("--inputfile and --outputfile are required without --batch")
+    else:
+        stats = SearchStats(args.stats, args.progress)
+        try:
+            solve(args.inputfile, args.outputfile, args, stats)
+        except TableFullError as error:
+            # The output would be missing this puzzle and the ones after it.
+            os.remove(args.outputfile)
+            parser.error(str(error))
+        if args.stats:
+            print(stats.summary(), file=sys.stderr)
+
+    # An example of how to write solutions to the outputfile. (This is not a correct solution, of course).
+    # with open(args.outputfile, 'w') as sys.stdout:
+    #    board.display()
+    #    print("")
     #    goal_board.display()
\ No newline at end of file